@@ -0,0 +1,68 @@
+import argparse
+import logging
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import AddressParser
+
+STATES = ['TN', 'MH', 'KA', 'IN-UP', 'DL', 'T.N.', 'Maharashtra', 'XX', '']
+CITIES = ['KARUR', 'NASHIK', 'NOIDA', 'GURUGRAM', '']
+STREETS = ['ANDANKOVIL EAST ROAD', 'MG ROAD', 'SECTOR 63', 'STATION ROAD, NEAR TEMPLE', '']
+COUNTRIES = ['India', 'IN', 'IND', 'india', 'NP', None]
+
+
+def make_structured_rows(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic parser output with gaps, mixed state spellings and float-typed PINs"""
+    rng = random.Random(seed)
+    pins = [rng.choice([None, rng.randint(110001, 855117)]) for _ in range(1000)]
+    pick = np.random.default_rng(seed).integers
+    return pd.DataFrame({
+        'BuildingNumber': np.array(['3/138', 'A-136', '', None], dtype=object)[pick(0, 4, rows)],
+        'StreetAddress': np.array(STREETS, dtype=object)[pick(0, len(STREETS), rows)],
+        'Landmark': '',
+        'Locality': '',
+        'City': np.array(CITIES + [None], dtype=object)[pick(0, len(CITIES) + 1, rows)],
+        'State': np.array(STATES + [None], dtype=object)[pick(0, len(STATES) + 1, rows)],
+        'PostalCode': np.array(pins, dtype=object)[pick(0, len(pins), rows)].astype(float),
+        'Country': np.array(COUNTRIES, dtype=object)[pick(0, len(COUNTRIES), rows)],
+    })
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Row-wise vs vectorized engine enrichment")
+    arg_parser.add_argument('--rows', type=int, default=1000000)
+    arg_parser.add_argument('--rowwise-rows', type=int, default=50000,
+                            help="rows timed in row-wise mode; its rate is extrapolated to --rows")
+    arg_parser.add_argument('--pin-file', default=None, help="PIN centroid CSV for the lookup path")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    engine = AddressParser(pin_centroids_file=args.pin_file, use_geocoder=False, reference_file='')
+    engine.logger.setLevel(logging.WARNING)
+    df = make_structured_rows(args.rows)
+
+    sample = df.head(args.rowwise_rows)
+    start = time.perf_counter()
+    rowwise = engine.process_dataframe(sample, verbose=False)
+    rowwise_rate = len(sample) / (time.perf_counter() - start)
+
+    vectorized_sample = engine.process_dataframe(sample, verbose=False, vectorized=True)
+    identical = rowwise.to_csv(index=False) == vectorized_sample.to_csv(index=False)
+
+    start = time.perf_counter()
+    engine.process_dataframe(df, verbose=False, vectorized=True)
+    vectorized_rate = len(df) / (time.perf_counter() - start)
+
+    print("\nEngine enrichment benchmark:")
+    print("-" * 40)
+    print(f"{'row-wise':15s}: {rowwise_rate:12.0f} rows/s ({len(sample)} rows)")
+    print(f"{'vectorized':15s}: {vectorized_rate:12.0f} rows/s ({len(df)} rows)")
+    print(f"{'speedup':15s}: {vectorized_rate / rowwise_rate:12.1f}x")
+    print(f"{'identical':15s}: {identical}")
+
+
+if __name__ == "__main__":
+    main()
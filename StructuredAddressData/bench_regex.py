@@ -0,0 +1,92 @@
+import argparse
+import logging
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from parser import AddressParser
+
+KEYWORDS = ['ROAD', 'RD', 'STREET', 'ST', 'LANE', 'CROSS', 'CROSS ROAD']
+STOP_WORDS = ['NEAR', 'BEHIND', 'OPPOSITE', 'LANDMARK', 'NAGAR', 'COLONY', 'ENCLAVE', 'PHASE', 'SECTOR']
+# Words that contain a keyword without being one, e.g. "ST" inside WEST or INDUSTRIAL
+DECOYS = ['WEST', 'EAST', 'ESTATE', 'INDUSTRIAL', 'CROSSING', 'BOARD', 'FIRST', 'TRUST', 'PLANE', 'DISTRICT']
+FILLER = ['PLOT', '12/4', 'SHRI', 'COMPLEX', 'GROUND', 'FLOOR', 'UNIT', 'A-136', 'MAIN', 'OLD']
+REALISTIC = [
+    '4, B, SAHIL SANKUL APPARTMENT, SHRAMIK NAGAR, SATPUR, NASHIK, MAHARASHTRA, 422012, IN',
+    'D.NO: 3/138, ANDANKOVIL EAST ROAD, NEAR TEMPLE, KARUR, TAMIL NADU, 639008, IN',
+    '7TH FLOOR, DLF CYBER CITY, BUILDING 10 TOWER C, GURUGRAM, IN-HR, 122002, IN',
+    'A-136, SECTOR 63, NOIDA, UTTAR PRADESH, 201301, IN',
+    'H.NO 12-2-417, MG ROAD, BEHIND BUS STAND, GUNTUR, ANDHRA PRADESH, 522001, IN',
+]
+
+
+def adversarial_row(rng: random.Random, length: int) -> str:
+    """Long comma-free free text dense in keywords but with no stop the lazy scan can reach"""
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(KEYWORDS + DECOYS + FILLER))
+    return ' '.join(words)
+
+
+def fuzz_row(rng: random.Random, length: int) -> str:
+    """Random mix of keywords, stop words, decoys, commas and whitespace runs"""
+    pieces = []
+    while sum(len(p) for p in pieces) < length:
+        pieces.append(rng.choice(KEYWORDS + STOP_WORDS + DECOYS + FILLER + [',', ' , ', '  ']))
+        pieces.append(rng.choice([' ', ' ', ' ', '\t', '']))
+    return ''.join(pieces)
+
+
+def make_rows(count: int, max_length: int, seed: int = 0) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    return {
+        'realistic': [rng.choice(REALISTIC) for _ in range(count)],
+        'fuzz': [fuzz_row(rng, rng.randint(20, max_length)) for _ in range(count)],
+        'adversarial': [adversarial_row(rng, rng.randint(max_length // 2, max_length)) for _ in range(count)],
+    }
+
+
+def time_rows(parser: AddressParser, rows: List[str]):
+    latencies = []
+    results = []
+    for text in rows:
+        start = time.perf_counter()
+        results.append(parser.extract_components(text))
+        latencies.append(time.perf_counter() - start)
+    return results, np.array(latencies) * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Worst-case per-row latency of the street and locality patterns")
+    arg_parser.add_argument('--rows', type=int, default=50, help="rows per input family")
+    arg_parser.add_argument('--max-length', type=int, default=5000, help="longest generated row in characters")
+    arg_parser.add_argument('--max-segment', type=int, default=200,
+                            help="longest comma-free run the guarded mode sends through re")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    modes = {
+        'backtracking': AddressParser(regex_mode='backtracking', max_segment_length=None),
+        'guarded': AddressParser(regex_mode='backtracking', max_segment_length=args.max_segment),
+        'linear': AddressParser(regex_mode='linear'),
+    }
+    for parser in modes.values():
+        parser.logger.setLevel(logging.ERROR)
+
+    print(f"\nPer-row extract_components latency (ms), rows up to {args.max_length} chars:")
+    print("-" * 78)
+    print(f"{'family':12s} {'mode':13s} {'median':>10s} {'p99':>10s} {'max':>10s} {'fallbacks':>10s} {'identical':>10s}")
+    for family, rows in make_rows(args.rows, args.max_length).items():
+        reference = None
+        for mode, parser in modes.items():
+            parser.regex_fallbacks = 0
+            results, latencies = time_rows(parser, rows)
+            reference = reference or results
+            print(f"{family:12s} {mode:13s} {np.median(latencies):10.3f} {np.percentile(latencies, 99):10.3f} "
+                  f"{latencies.max():10.3f} {parser.regex_fallbacks:10d} {str(results == reference):>10s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,107 @@
+import argparse
+import os
 import pandas as pd
 from transformers import AutoTokenizer, LlamaForTokenClassification
 import torch
 import re
 import json
-from typing import List, Dict, Tuple
+import hashlib
+from typing import List, Dict, Optional, Tuple
 import logging
+import threading
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from geopy.extra.rate_limiter import RateLimiter
 import time
 import requests
 from tqdm import tqdm
 
+from parser import CITY_NAMES
+from result_store import RESULT_STORE_FILE, ResultStore, process_dataframe_cached
+from reference_data import REFERENCE_FILE, STATE_MAPPING, digest_pins, fingerprint_sources, load_reference_data
+from spatial_index import PinSpatialIndex
+
+# CSV of pincode, latitude, longitude[, town, state]; the India Post directory layout also works
+PIN_CENTROIDS_FILE = "data/reference/pin_centroids.csv"
+
+# parser.py output column -> enriched output column; Landmark and Locality are not carried over
+INPUT_COLUMN_MAP = {
+    'BuildingNumber': 'BuildingNumber',
+    'StreetAddress': 'StreetName',
+    'City': 'TownName',
+    'State': 'CountrySubDivision',
+    'PostalCode': 'PostCode',
+    'Country': 'Country',
+}
+
+# Used when a parser column is missing or empty
+INPUT_DEFAULTS = {'Country': 'IN'}
+
+# One rate-limited geocoder per process, shared by every AddressParser (e.g. the service's instances)
+_shared_geocode = None
+_shared_geocode_lock = threading.Lock()
+
+
+def shared_geocode() -> RateLimiter:
+    """The process-wide Nominatim lookup, created on first use"""
+    global _shared_geocode
+    with _shared_geocode_lock:
+        if _shared_geocode is None:
+            geocoder = Nominatim(user_agent="address_parser_india", timeout=10)
+            # Nominatim's usage policy allows one request per second per client, not per parser;
+            # RateLimiter hands out request slots under its own lock. Errors are handled in geocode_pincode.
+            _shared_geocode = RateLimiter(geocoder.geocode, min_delay_seconds=1.0, max_retries=0,
+                                          swallow_exceptions=False)
+        return _shared_geocode
+
+
 class AddressParser:
-    def __init__(self):
+    def __init__(self, pin_centroids_file: Optional[str] = None, use_geocoder: bool = False,
+                 max_fill_distance_km: float = 5.0, reference_file: str = REFERENCE_FILE):
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
-        self.geocoder = Nominatim(
-            user_agent="address_parser_india",
-            timeout=10
-        )
+        self.geocode = shared_geocode()
+        self.use_geocoder = use_geocoder
 
         self.pincode_cache = {}
         self.geocoding_cache = {}
+        # PINs added to pin_index from geocoder results during this run
+        self.geocoded_pins = set()
+
+        # Prebuilt artifact shared across processes via mmap; ignored if built from older code.
+        # Its PIN tables stand on their own, whichever CSV they were built from.
+        self.source_fingerprint = fingerprint_sources(STATE_MAPPING, CITY_NAMES)
+        self.reference = load_reference_data(reference_file, self.source_fingerprint)
+
         self.initialize_state_mapping()
 
+        # Local PIN centroids; geocoder results are added as they arrive. With the artifact,
+        # lookups and nearest searches read its mapped tables and only the additions are per-process.
+        # An explicit pin_centroids_file other than the one the artifact was built from wins.
+        use_artifact_pins = self.reference is not None
+        if use_artifact_pins and pin_centroids_file and \
+                os.path.abspath(pin_centroids_file) != self.reference.pin_source():
+            self.logger.warning(f"{reference_file} was built from {self.reference.pin_source() or 'no PIN file'}; "
+                                f"loading PINs from {pin_centroids_file} instead")
+            use_artifact_pins = False
+        if use_artifact_pins:
+            self.pin_index = PinSpatialIndex.from_reference(self.reference)
+            self.pin_digest = self.reference.pin_digest
+        else:
+            self.pin_index = PinSpatialIndex.load(pin_centroids_file or PIN_CENTROIDS_FILE)
+            self.pin_digest = digest_pins(self.pin_index.iter_pins())
+        self.max_fill_distance_km = max_fill_distance_km
+
     def initialize_state_mapping(self):
         """Initialize comprehensive mapping of state codes and names"""
-        self.state_mapping = {
-            'ANDHRA PRADESH': ['AP', 'ANDHRA', 'A.P.'],
-            'ARUNACHAL PRADESH': ['AR', 'ARUNACHAL'],
-            'ASSAM': ['AS'],
-            'BIHAR': ['BR'],
-            'CHHATTISGARH': ['CG', 'CT'],
-            'GOA': ['GA'],
-            'GUJARAT': ['GJ'],
-            'HARYANA': ['HR'],
-            'HIMACHAL PRADESH': ['HP'],
-            'JHARKHAND': ['JH'],
-            'KARNATAKA': ['KA', 'KAR'],
-            'KERALA': ['KL', 'KER'],
-            'MADHYA PRADESH': ['MP'],
-            'MAHARASHTRA': ['MH', 'MAHA'],
-            'MANIPUR': ['MN'],
-            'MEGHALAYA': ['ML'],
-            'MIZORAM': ['MZ'],
-            'NAGALAND': ['NL'],
-            'ODISHA': ['OR', 'OD'],
-            'PUNJAB': ['PB'],
-            'RAJASTHAN': ['RJ'],
-            'SIKKIM': ['SK'],
-            'TAMIL NADU': ['TN', 'TAMILNADU', 'T.N.'],
-            'TELANGANA': ['TS', 'TG', 'TELENGANA'],
-            'TRIPURA': ['TR'],
-            'UTTAR PRADESH': ['UP'],
-            'UTTARAKHAND': ['UK', 'UA'],
-            'WEST BENGAL': ['WB'],
-            'DELHI': ['DL', 'NCT', 'NCT OF DELHI', 'DELHI NCT'],
-            'JAMMU AND KASHMIR': ['JK'],
-            'LADAKH': ['LA'],
-            'PUDUCHERRY': ['PY', 'PONDICHERRY'],
-            'ANDAMAN AND NICOBAR ISLANDS': ['AN'],
-            'CHANDIGARH': ['CH'],
-            'DADRA AND NAGAR HAVELI AND DAMAN AND DIU': ['DN', 'DD'],
-            'LAKSHADWEEP': ['LD']
-        }
+        if self.reference:
+            # Codes, full names and variants are all in the artifact's sorted code table
+            self.state_mapping = {}
+            self.state_code_to_name = {}
+            return
+
+        self.state_mapping = STATE_MAPPING
 
         # Create reverse mapping
         self.state_code_to_name = {}
@@ -88,8 +125,9 @@ class AddressParser:
         state_upper = state_code.upper().strip()
 
         # Check direct mapping
-        if state_upper in self.state_code_to_name:
-            return self.state_code_to_name[state_upper]
+        name = self.lookup_state_code(state_upper)
+        if name:
+            return name
 
         # Check if it's already a full state name
         for full_name in self.state_mapping.keys():
@@ -103,16 +141,136 @@ class AddressParser:
 
         return state_code  # Return original if no mapping found
 
+    def lookup_state_code(self, state_upper: str) -> Optional[str]:
+        """Full state name for an upper-case code or name, from the artifact when loaded"""
+        if self.reference:
+            return self.reference.convert_state_code(state_upper)
+        return self.state_code_to_name.get(state_upper)
+
+    def parse_coordinate(self, value) -> Optional[float]:
+        """Parse a latitude/longitude value, returning None if missing or invalid"""
+        try:
+            coordinate = float(value)
+        except (TypeError, ValueError):
+            return None
+        return None if pd.isna(coordinate) else coordinate
+
+    def pincode_key(self, pincode: str) -> str:
+        """Normalize a PIN for lookups (CSV readers turn 422012 into 422012.0 when a column has gaps)"""
+        return re.sub(r'\.0+$', '', pincode.strip())
+
+    def geocode_pincode(self, pincode: str) -> Optional[Dict]:
+        """Look up a PIN code with the online geocoder. Timeouts and outages are not cached."""
+        if pincode in self.geocoding_cache:
+            return self.geocoding_cache[pincode]
+
+        info = None
+        try:
+            location = self.geocode(
+                {'postalcode': pincode, 'country': 'India'},
+                addressdetails=True
+            )
+            if location:
+                address = location.raw.get('address', {})
+                info = {
+                    'city': (address.get('city') or address.get('town') or address.get('village')
+                             or address.get('state_district') or address.get('county') or '').upper(),
+                    'state': (address.get('state') or '').upper(),
+                    'latitude': location.latitude,
+                    'longitude': location.longitude
+                }
+        except (GeocoderTimedOut, GeocoderServiceError) as e:
+            self.logger.warning(f"Geocoding failed for PIN {pincode}: {str(e)}")
+            return None
+
+        self.geocoding_cache[pincode] = info
+        return info
+
+    def get_location_from_pincode(self, pincode: str) -> Optional[Dict]:
+        """Get city, state and coordinates for a PIN code, preferring the local index"""
+        pincode = self.pincode_key(pincode)
+        if pincode in self.pincode_cache:
+            return self.pincode_cache[pincode]
+
+        info = None
+        entry = self.pin_index.lookup(pincode)
+        if entry and entry['town']:
+            info = {
+                'city': entry['town'],
+                'state': entry['state'],
+                'latitude': entry['latitude'],
+                'longitude': entry['longitude']
+            }
+        elif self.use_geocoder:
+            info = self.geocode_pincode(pincode)
+            if pincode not in self.geocoding_cache:
+                return None  # transient failure; asked again next time
+            if info:
+                # Keep the coordinates so nearby records can be filled locally
+                self.pin_index.add(pincode, info['latitude'], info['longitude'], info['city'], info['state'])
+                self.geocoded_pins.add(pincode)
+
+        self.pincode_cache[pincode] = info
+        return info
+
+    def fingerprint(self) -> str:
+        """Hash of the reference data and settings that shape enrichment results"""
+        settings = {
+            'sources': self.source_fingerprint.hex(),
+            'pins': self.pin_digest.hex(),
+            'use_geocoder': self.use_geocoder,
+            'max_fill_distance_km': self.max_fill_distance_km,
+            'cache_key_format': 2
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def input_values(self, row: pd.Series) -> Dict[str, str]:
+        """The row's parser columns, cleaned and renamed through INPUT_COLUMN_MAP"""
+        return {target: self.clean_value(row.get(source, INPUT_DEFAULTS.get(source, '')))
+                for source, target in INPUT_COLUMN_MAP.items()}
+
+    def coordinate_column(self, df: pd.DataFrame, column: str) -> List[Optional[float]]:
+        """parse_coordinate applied to a whole column, None where missing"""
+        if column not in df.columns:
+            return [None] * len(df)
+        return [self.parse_coordinate(value) for value in df[column]]
+
+    def cache_keys(self, df: pd.DataFrame) -> List[str]:
+        """Per-row hash of the fields process_address reads, built column-wise"""
+        columns = [self.clean_column(df, source, INPUT_DEFAULTS.get(source, '')) for source in INPUT_COLUMN_MAP]
+        for column in ('Latitude', 'Longitude'):
+            columns.append(['' if value is None else repr(value) for value in self.coordinate_column(df, column)])
+        return [hashlib.sha256('\x1f'.join(values).encode('utf-8')).hexdigest() for values in zip(*columns)]
+
+    def cacheable(self, df: pd.DataFrame) -> List[bool]:
+        """Whether each processed row's result may be stored under the current fingerprint.
+
+        Without the geocoder the PIN index never changes, so every result is
+        final. With it, a row whose PIN is missing from the local data, was
+        geocoded this run or failed to geocode, or whose PIN is filled from
+        coordinates, depends on lookups the fingerprint cannot capture.
+        """
+        if not self.use_geocoder:
+            return [True] * len(df)
+        source = next(source for source, target in INPUT_COLUMN_MAP.items() if target == 'PostCode')
+        pincodes = self.clean_column(df, source).map(self.pincode_key)
+        flags = []
+        for pincode, lat, lon in zip(pincodes, self.coordinate_column(df, 'Latitude'), self.coordinate_column(df, 'Longitude')):
+            if not pincode:
+                flags.append(lat is None or lon is None)
+                continue
+            entry = self.pin_index.lookup(pincode)
+            flags.append(entry is not None and bool(entry['town']) and pincode not in self.geocoded_pins)
+        return flags
+
     def process_address(self, row: pd.Series) -> Dict[str, str]:
         """Process a single address with specific fields"""
-        result = {
-            'BuildingNumber': self.clean_value(row.get('BuildingNumber', '')),
-            'StreetName': self.clean_value(row.get('StreetAddress', '')),
-            'TownName': self.clean_value(row.get('City', '')),
-            'CountrySubDivision': self.convert_state_code(self.clean_value(row.get('State', ''))),
-            'PostCode': self.clean_value(row.get('PostalCode', '')),
-            'Country': 'INDIA' if self.clean_value(row.get('Country', 'IN')).upper() in ['IN', 'IND', 'INDIA'] else self.clean_value(row.get('Country', 'IN'))
-        }
+        result = self.input_values(row)
+        result['CountrySubDivision'] = self.convert_state_code(result['CountrySubDivision'])
+        if result['Country'].upper() in ['IN', 'IND', 'INDIA']:
+            result['Country'] = 'INDIA'
+        result['Latitude'] = self.parse_coordinate(row.get('Latitude'))
+        result['Longitude'] = self.parse_coordinate(row.get('Longitude'))
 
         # Try to get additional info from PIN code if available
         if result['PostCode'] and not (result['TownName'] or result['CountrySubDivision']):
@@ -122,14 +280,150 @@ class AddressParser:
                     result['TownName'] = pincode_info['city']
                 if not result['CountrySubDivision']:
                     result['CountrySubDivision'] = self.convert_state_code(pincode_info['state'])
+                if result['Latitude'] is None:
+                    result['Latitude'] = pincode_info['latitude']
+                    result['Longitude'] = pincode_info['longitude']
+        elif result['PostCode'] and result['Latitude'] is None:
+            entry = self.pin_index.lookup(self.pincode_key(result['PostCode']))
+            if entry:
+                result['Latitude'] = entry['latitude']
+                result['Longitude'] = entry['longitude']
+
+        # Fill a missing PIN and town from the nearest known PIN centroid
+        if not result['PostCode'] and result['Latitude'] is not None and result['Longitude'] is not None:
+            nearest = self.pin_index.nearest(result['Latitude'], result['Longitude'], max_km=self.max_fill_distance_km)
+            if nearest:
+                result['PostCode'] = nearest['pincode']
+                if not result['TownName']:
+                    result['TownName'] = nearest['town']
+                if not result['CountrySubDivision']:
+                    result['CountrySubDivision'] = self.convert_state_code(nearest['state'])
+
+        for key in ('Latitude', 'Longitude'):
+            result[key] = '' if result[key] is None else round(result[key], 6)
 
         return result
 
-    def process_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+    def empty_result(self) -> Dict[str, str]:
+        """Output row for an address that could not be processed"""
+        return {
+            'BuildingNumber': '',
+            'StreetName': '',
+            'TownName': '',
+            'CountrySubDivision': '',
+            'PostCode': '',
+            'Country': 'INDIA',
+            'Latitude': '',
+            'Longitude': ''
+        }
+
+    def clean_column(self, df: pd.DataFrame, column: str, default: str = '') -> pd.Series:
+        """clean_value applied to a whole column"""
+        if column not in df.columns:
+            return pd.Series(self.clean_value(default), index=df.index, dtype=object)
+        values = df[column]
+        cleaned = values.astype(str).str.strip().astype(object)
+        cleaned[values.isna().to_numpy()] = ''
+        return cleaned
+
+    def convert_state_codes(self, states: pd.Series) -> pd.Series:
+        """convert_state_code applied to a whole column, one lookup per distinct value"""
+        upper = states.str.upper().str.strip()
+        names = {code: self.lookup_state_code(code) for code in upper.unique()}
+        mapped = upper.map(names)
+        return mapped.where(mapped.notna(), states).astype(object)
+
+    def process_dataframe_vectorized(self, df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+        """Column-wise equivalent of process_address over a whole DataFrame"""
+        result = pd.DataFrame({target: self.clean_column(df, source, INPUT_DEFAULTS.get(source, ''))
+                               for source, target in INPUT_COLUMN_MAP.items()}, index=df.index)
+        result['CountrySubDivision'] = self.convert_state_codes(result['CountrySubDivision'])
+        country = result['Country']
+        result['Country'] = country.where(~country.str.upper().isin(['IN', 'IND', 'INDIA']), 'INDIA')
+
+        latitude = df['Latitude'].map(self.parse_coordinate) if 'Latitude' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        longitude = df['Longitude'].map(self.parse_coordinate) if 'Longitude' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        latitude = latitude.astype(object).where(latitude.notna(), None)
+        longitude = longitude.astype(object).where(longitude.notna(), None)
+
+        # Like the row-wise path, a row that raises is logged and output empty; the rest carry on
+        failed = set()
+
+        def fail_row(idx, e: Exception):
+            self.logger.error(f"Error processing row: {df.loc[idx]}")
+            self.logger.error(str(e))
+            for column, value in self.empty_result().items():
+                if column not in ('Latitude', 'Longitude'):
+                    result.at[idx, column] = value
+            latitude[idx] = longitude[idx] = None
+            failed.add(idx)
+
+        has_pin = result['PostCode'] != ''
+        needs_lookup = has_pin & (result['TownName'] == '') & (result['CountrySubDivision'] == '')
+        locations: Dict[str, Optional[Dict]] = {}
+        for idx, pincode in result.loc[needs_lookup, 'PostCode'].items():
+            try:
+                # Each distinct PIN is resolved once; repeats reuse the result
+                if pincode not in locations:
+                    locations[pincode] = self.get_location_from_pincode(pincode)
+                info = locations[pincode]
+                if info:
+                    result.at[idx, 'TownName'] = info['city']
+                    result.at[idx, 'CountrySubDivision'] = self.convert_state_code(info['state'])
+                    if latitude[idx] is None:
+                        latitude[idx] = info['latitude']
+                        longitude[idx] = info['longitude']
+            except Exception as e:
+                fail_row(idx, e)
+
+        if len(self.pin_index):
+            coordinates_from_pin = has_pin & ~needs_lookup & latitude.isna()
+            for idx, pincode in result.loc[coordinates_from_pin, 'PostCode'].items():
+                try:
+                    entry = self.pin_index.lookup(self.pincode_key(pincode))
+                    if entry:
+                        latitude[idx] = entry['latitude']
+                        longitude[idx] = entry['longitude']
+                except Exception as e:
+                    fail_row(idx, e)
+
+            fill_from_coordinates = ~has_pin & latitude.notna() & longitude.notna()
+            nearest_by_point: Dict[Tuple[float, float], Optional[Dict]] = {}
+            for idx in result.index[fill_from_coordinates.to_numpy()]:
+                if idx in failed:
+                    continue
+                try:
+                    point = (latitude[idx], longitude[idx])
+                    if point not in nearest_by_point:
+                        nearest_by_point[point] = self.pin_index.nearest(point[0], point[1], max_km=self.max_fill_distance_km)
+                    entry = nearest_by_point[point]
+                    if entry:
+                        result.at[idx, 'PostCode'] = entry['pincode']
+                        if not result.at[idx, 'TownName']:
+                            result.at[idx, 'TownName'] = entry['town']
+                        if not result.at[idx, 'CountrySubDivision']:
+                            result.at[idx, 'CountrySubDivision'] = self.convert_state_code(entry['state'])
+                except Exception as e:
+                    fail_row(idx, e)
+
+        result['Latitude'] = latitude.map(lambda v: '' if v is None else round(v, 6))
+        result['Longitude'] = longitude.map(lambda v: '' if v is None else round(v, 6))
+        result = result.reset_index(drop=True)
+
+        if verbose:
+            completion_stats = self.calculate_completion_stats(result)
+            self.display_stats(completion_stats)
+
+        return result
+
+    def process_dataframe(self, df: pd.DataFrame, verbose: bool = True, vectorized: bool = False) -> pd.DataFrame:
         """Process entire DataFrame with progress tracking"""
+        if vectorized:
+            return self.process_dataframe_vectorized(df, verbose=verbose)
+
         results = []
 
-        with tqdm(total=len(df), desc="Processing addresses") as pbar:
+        with tqdm(total=len(df), desc="Processing addresses", disable=not verbose) as pbar:
             for _, row in df.iterrows():
                 try:
                     processed_address = self.process_address(row)
@@ -137,21 +431,15 @@ class AddressParser:
                 except Exception as e:
                     self.logger.error(f"Error processing row: {row}")
                     self.logger.error(str(e))
-                    results.append({
-                        'BuildingNumber': '',
-                        'StreetName': '',
-                        'TownName': '',
-                        'CountrySubDivision': '',
-                        'PostCode': '',
-                        'Country': 'INDIA'
-                    })
+                    results.append(self.empty_result())
                 pbar.update(1)
 
         result_df = pd.DataFrame(results)
 
         # Calculate and display completion statistics
-        completion_stats = self.calculate_completion_stats(result_df)
-        self.display_stats(completion_stats)
+        if verbose:
+            completion_stats = self.calculate_completion_stats(result_df)
+            self.display_stats(completion_stats)
 
         return result_df
 
@@ -171,17 +459,42 @@ class AddressParser:
             print(f"{field:15s}: {rate:6.2f}%")
 
 def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Enrich parser.py output (structured_addresses_*.csv); pipeline.py runs both stages in one pass")
+    arg_parser.add_argument('input', help="structured address CSV written by parser.py")
+    arg_parser.add_argument('--output', default=None, help="default: data_output/addresses_<name>.csv")
+    # Vectorized enrichment is cheaper than hashing and fetching rows from the store, so caching is opt-in
+    arg_parser.add_argument('--cache', action='store_true', help="reuse results from the persistent result store")
+    arg_parser.add_argument('--cache-file', default=RESULT_STORE_FILE, help="result store used with --cache")
+    arg_parser.add_argument('--rowwise', action='store_true', help="use per-row enrichment instead of vectorized")
+    arg_parser.add_argument('--geocode', action='store_true',
+                            help="look up PINs missing from the local index online (rate-limited to 1/s)")
+    args = arg_parser.parse_args()
+
     try:
-        parser = AddressParser()
+        parser = AddressParser(use_geocoder=args.geocode)
 
-        input_file = "D:/UPSC/data/output/structured_addresses.csv"
-        df = pd.read_csv(input_file)
+        input_file = args.input
+        name = os.path.splitext(os.path.basename(input_file))[0]
+        if name.startswith('structured_addresses_'):
+            name = name[len('structured_addresses_'):]
+        output_file = args.output or f"data_output/addresses_{name}.csv"
+        df = pd.read_csv(input_file, dtype=str)
 
         print(f"Processing {len(df)} addresses...")
 
-        result_df = parser.process_dataframe(df)
+        if not args.cache:
+            result_df = parser.process_dataframe(df, verbose=False, vectorized=not args.rowwise)
+            parser.display_stats(parser.calculate_completion_stats(result_df))
+        else:
+            # Only rows that are new or cached under an older fingerprint are re-enriched
+            store = ResultStore(args.cache_file, namespace='engine', fingerprint=parser.fingerprint())
+            result_df = process_dataframe_cached(parser, df, store, verbose=False, vectorized=not args.rowwise)
+            parser.display_stats(parser.calculate_completion_stats(result_df))
+            store.display_stats()
+            store.close()
 
-        output_file = "D:/UPSC/data_output/addresses.csv"
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
         result_df.to_csv(output_file, index=False)
         print(f"\nResults saved to {output_file}")
 
@@ -0,0 +1,205 @@
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from engine import AddressParser
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class RunningCompletionStats:
+    """Field completion rates accumulated chunk by chunk"""
+
+    def __init__(self):
+        self.rows = 0
+        self.filled: Dict[str, int] = {}
+
+    def update(self, df: pd.DataFrame):
+        self.rows += len(df)
+        for column in df.columns:
+            filled = int((df[column].notna() & (df[column] != '')).sum())
+            self.filled[column] = self.filled.get(column, 0) + filled
+
+    def stats(self) -> Dict[str, float]:
+        return {column: 100 * count / self.rows if self.rows else 0.0 for column, count in self.filled.items()}
+
+
+class Stage:
+    """Busy/wait bookkeeping for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.busy = 0.0
+        self.chunks = 0
+
+    def utilisation(self, wall: float) -> float:
+        return 100 * self.busy / wall if wall else 0.0
+
+
+class StreamingEngine:
+    """Chunked reader -> enrichment -> appending writer, connected by bounded queues.
+
+    The reader and writer run on their own threads so disk I/O overlaps with
+    enrichment, and at most queue_size chunks wait between any two stages,
+    which bounds memory regardless of input size.
+    """
+
+    def __init__(self, engine: Optional[AddressParser] = None, chunksize: int = 50000,
+                 queue_size: int = 4, vectorized: bool = True):
+        logging.basicConfig(level=logging.INFO)
+        self.engine = engine or AddressParser()
+        self.chunksize = chunksize
+        self.queue_size = queue_size
+        self.vectorized = vectorized
+        self.stages = {name: Stage(name) for name in ('read', 'enrich', 'write')}
+        self.completion = RunningCompletionStats()
+        self.errors = []
+        self.stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up once another stage has failed"""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, stage: str, error: Exception):
+        logger.error(f"{stage} stage failed: {str(error)}")
+        self.errors.append(error)
+        self.stop.set()
+
+    def _reader(self, input_file: str, out_q: queue.Queue):
+        stage = self.stages['read']
+        try:
+            # Read everything as text so a PIN column keeps one type across chunks
+            chunks = pd.read_csv(input_file, chunksize=self.chunksize, dtype=str)
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                stage.busy += time.perf_counter() - start
+                if chunk is None or not self._put(out_q, chunk):
+                    break
+                stage.chunks += 1
+        except Exception as e:
+            self._fail('read', e)
+        finally:
+            self._put(out_q, _DONE)
+
+    def _writer(self, output_file: str, in_q: queue.Queue):
+        stage = self.stages['write']
+        tmp_file = output_file + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+            with open(tmp_file, 'w', newline='', encoding='utf-8') as out:
+                header = True
+                while True:
+                    chunk = self._get(in_q)
+                    if chunk is _DONE:
+                        break
+                    start = time.perf_counter()
+                    chunk.to_csv(out, index=False, header=header)
+                    stage.busy += time.perf_counter() - start
+                    stage.chunks += 1
+                    header = False
+            if not self.errors:
+                os.replace(tmp_file, output_file)
+        except Exception as e:
+            self._fail('write', e)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def run(self, input_file: str, output_file: str) -> Dict:
+        read_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        reader = threading.Thread(target=self._reader, args=(input_file, read_q), daemon=True)
+        writer = threading.Thread(target=self._writer, args=(output_file, write_q), daemon=True)
+
+        wall_start = time.perf_counter()
+        reader.start()
+        writer.start()
+
+        stage = self.stages['enrich']
+        try:
+            while True:
+                chunk = self._get(read_q)
+                if chunk is _DONE:
+                    break
+                start = time.perf_counter()
+                result = self.engine.process_dataframe(chunk, verbose=False, vectorized=self.vectorized)
+                self.completion.update(result)
+                stage.busy += time.perf_counter() - start
+                stage.chunks += 1
+                if not self._put(write_q, result):
+                    break
+                if stage.chunks % 10 == 0:
+                    logger.info(f"Enriched {self.completion.rows} rows")
+        except Exception as e:
+            self._fail('enrich', e)
+        finally:
+            self._put(write_q, _DONE)
+
+        reader.join()
+        writer.join()
+        wall = time.perf_counter() - wall_start
+
+        if self.errors:
+            raise self.errors[0]
+        return {
+            'rows': self.completion.rows,
+            'wall': wall,
+            'rows_per_sec': self.completion.rows / wall if wall else 0.0,
+            'utilisation': {name: s.utilisation(wall) for name, s in self.stages.items()},
+            'completion': self.completion.stats(),
+        }
+
+    def display_report(self, report: Dict):
+        print(f"\n{report['rows']} rows in {report['wall']:.2f}s ({report['rows_per_sec']:.0f} rows/s)")
+        print("\nStage utilisation:")
+        print("-" * 40)
+        bottleneck = max(report['utilisation'], key=report['utilisation'].get)
+        for name, rate in report['utilisation'].items():
+            marker = '  <- bottleneck' if name == bottleneck else ''
+            print(f"{name:15s}: {rate:6.2f}%{marker}")
+        self.engine.display_stats(report['completion'])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Stream structured addresses through the enrichment engine")
+    arg_parser.add_argument('--input', default='data/output/structured_addresses.csv')
+    arg_parser.add_argument('--output', default='data_output/addresses.csv')
+    arg_parser.add_argument('--chunksize', type=int, default=50000)
+    arg_parser.add_argument('--queue-size', type=int, default=4)
+    arg_parser.add_argument('--rowwise', action='store_true', help="use per-row enrichment instead of vectorized")
+    arg_parser.add_argument('--geocode', action='store_true',
+                            help="look up PINs missing from the local index online (rate-limited to 1/s)")
+    args = arg_parser.parse_args()
+
+    streaming = StreamingEngine(AddressParser(use_geocoder=args.geocode), chunksize=args.chunksize, queue_size=args.queue_size,
+                                vectorized=not args.rowwise)
+    report = streaming.run(args.input, args.output)
+    streaming.display_report(report)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
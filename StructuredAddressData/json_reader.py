@@ -0,0 +1,168 @@
+import json
+import logging
+from typing import Dict, Iterator, List
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns produced for every record, in the same order as the CSV input files
+LEGAL_ADDRESS_COLUMNS = [
+    'Entity.LegalName',
+    'Entity.LegalAddress.FirstAddressLine',
+    'Entity.LegalAddress.AdditionalAddressLine.1',
+    'Entity.LegalAddress.AdditionalAddressLine.2',
+    'Entity.LegalAddress.AdditionalAddressLine.3',
+    'Entity.LegalAddress.City',
+    'Entity.LegalAddress.Region',
+    'Entity.LegalAddress.Country',
+    'Entity.LegalAddress.PostalCode'
+]
+
+ADDRESS_LINE_COLUMNS = LEGAL_ADDRESS_COLUMNS[1:5]
+
+# Optional coordinates, carried through the parser to the engine's nearest-PIN fill
+COORDINATE_COLUMNS = ['Latitude', 'Longitude']
+
+LOCATION_COLUMNS = {
+    'city': 'Entity.LegalAddress.City',
+    'state': 'Entity.LegalAddress.Region',
+    'country': 'Entity.LegalAddress.Country',
+    'postal_code': 'Entity.LegalAddress.PostalCode',
+    'latitude': 'Latitude',
+    'longitude': 'Longitude'
+}
+
+READ_BLOCK_SIZE = 1 << 16
+
+# A decode error this close to the end of the buffer may be a literal or number cut short
+TRUNCATION_SLACK = 8
+
+
+def _is_truncated(buffer: str, error: json.JSONDecodeError) -> bool:
+    """Whether a decode error can be explained by the value running past the end of the buffer"""
+    if error.msg.startswith('Unterminated string'):
+        return True  # strings cannot contain raw newlines, so this only happens at the buffer end
+    rest = buffer[error.pos:]
+    return not rest.strip() or (len(rest) <= TRUNCATION_SLACK and '\n' not in rest)
+
+
+def flatten_record(record: Dict) -> Dict[str, str]:
+    """Flatten a nested {name, address, location} record into Entity.LegalAddress.* columns"""
+    flat = {column: '' for column in LEGAL_ADDRESS_COLUMNS + COORDINATE_COLUMNS}
+    flat['Entity.LegalName'] = record.get('name') or ''
+
+    address = record.get('address') or []
+    if isinstance(address, str):
+        address = [address]
+    elif not isinstance(address, list):
+        logger.warning(f"Coercing non-list address of type {type(address).__name__} to a single line")
+        address = [address]
+    lines = [str(line) for line in address if line is not None]
+    # Anything beyond the fourth line is folded into the last address column
+    if len(lines) > len(ADDRESS_LINE_COLUMNS):
+        lines = lines[:len(ADDRESS_LINE_COLUMNS) - 1] + [' '.join(lines[len(ADDRESS_LINE_COLUMNS) - 1:])]
+    for column, line in zip(ADDRESS_LINE_COLUMNS, lines):
+        flat[column] = line
+
+    location = record.get('location') or {}
+    if not isinstance(location, dict):
+        logger.warning(f"Ignoring non-object location of type {type(location).__name__}")
+        location = {}
+    for key, column in LOCATION_COLUMNS.items():
+        value = location.get(key)
+        if value is not None:
+            flat[column] = str(value)
+
+    return flat
+
+
+def iter_json_records(path: str, block_size: int = READ_BLOCK_SIZE) -> Iterator[Dict]:
+    """Yield top-level JSON values from a file one at a time.
+
+    Handles NDJSON, concatenated JSON objects and a single top-level array
+    without loading the whole file: only the record currently being decoded
+    is held in memory. A malformed line is logged with its line number and
+    skipped; a malformed value that cannot be skipped line-wise raises.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    in_array = None
+    # Characters and lines dropped from the front of the buffer, for error positions
+    offset = 0
+    line = 1
+
+    def drop(count: int):
+        nonlocal buffer, pos, offset, line
+        offset += count
+        line += buffer.count('\n', 0, count)
+        buffer = buffer[count:]
+        pos -= count
+
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            # Skip whitespace and, inside a top-level array, element separators
+            while True:
+                while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] in ',]')):
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                drop(len(buffer))
+                buffer = f.read(block_size)
+                pos = 0
+                eof = not buffer
+
+            if pos >= len(buffer):
+                return
+
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                    continue
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof or not _is_truncated(buffer, e):
+                    lineno = line + buffer.count('\n', 0, pos)
+                    where = f"line {lineno} (character {offset + pos})"
+                    newline = buffer.find('\n', pos)
+                    if newline < 0:
+                        raise ValueError(f"Malformed JSON in {path} at {where}: {e.msg}")
+                    # Skip the bad line and carry on with the next record
+                    logger.warning(f"Skipping malformed JSON in {path} at {where}: {e.msg}")
+                    pos = newline + 1
+                    continue
+                value, end = None, None
+
+            # A value touching the end of the buffer may be truncated; read more and retry
+            if end is None or (end == len(buffer) and not eof):
+                drop(pos)
+                more = f.read(block_size)
+                eof = not more
+                buffer += more
+                continue
+
+            pos = end
+            yield value
+
+            if pos > block_size:
+                drop(pos)
+
+
+def iter_json_chunks(path: str, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    """Stream nested JSON/NDJSON records as flattened DataFrame chunks"""
+    rows: List[Dict[str, str]] = []
+    for record in iter_json_records(path):
+        if not isinstance(record, dict):
+            logger.warning(f"Skipping non-object JSON value in {path}")
+            continue
+        rows.append(flatten_record(record))
+        if len(rows) >= chunksize:
+            yield pd.DataFrame(rows, columns=LEGAL_ADDRESS_COLUMNS + COORDINATE_COLUMNS)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=LEGAL_ADDRESS_COLUMNS + COORDINATE_COLUMNS)
@@ -0,0 +1,100 @@
+import bisect
+import re
+from typing import Iterator, List, Optional
+
+# (?:KW1|KW2)(?:[^,]*?)(?=,|\s+(?:STOP1|STOP2|...|$)) -- the shape of the parser's street patterns
+LAZY_STOP_SHAPE = re.compile(r'\(\?:([A-Z0-9 |]+)\)\(\?:\[\^,\]\*\?\)\(\?=,\|\\s\+\(\?:([A-Z0-9|]+)\|\$\)\)')
+
+# ([^,]+(?:KW1|KW2|...))[^,]* -- the shape of the parser's first locality pattern
+GREEDY_SEGMENT_SHAPE = re.compile(r'\(\[\^,\]\+\(\?:([A-Z0-9 |]+)\)\)\[\^,\]\*')
+
+
+class LinearStreetMatcher:
+    """Linear-time equivalent of re.finditer for one lazy keyword-to-stop pattern.
+
+    The backtracking engine re-scans the text after every keyword occurrence
+    until it reaches a stop, which is quadratic on long comma-free lines.
+    Here every stop position is collected once, and each keyword occurrence
+    is resolved by a binary search for the first stop at or after it.
+    """
+
+    def __init__(self, keywords: List[str], stop_words: List[str]):
+        self.keywords = keywords
+        self.keyword_re = re.compile('|'.join(re.escape(k) for k in keywords))
+        # Whole whitespace runs only: the lookbehind keeps \s+ from re-trying inside a run
+        stop_alternation = '|'.join(re.escape(w) for w in stop_words)
+        self.stop_re = re.compile(f",|(?<!\\s)\\s+(?=(?:{stop_alternation})|$)")
+
+    @classmethod
+    def from_pattern(cls, pattern: str) -> Optional['LinearStreetMatcher']:
+        """Matcher for a pattern of the supported shape, or None if it has another shape"""
+        shape = LAZY_STOP_SHAPE.fullmatch(pattern)
+        if not shape:
+            return None
+        return cls(shape.group(1).split('|'), shape.group(2).split('|'))
+
+    def stops(self, text: str) -> List[int]:
+        """Sorted positions where the lookahead (?=,|\\s+(?:STOP|$)) succeeds"""
+        # A comma match spans one position; \s+ can start anywhere inside a run and still reach its end
+        return [i for match in self.stop_re.finditer(text) for i in range(*match.span())]
+
+    def finditer(self, text: str) -> Iterator[str]:
+        """The group(0) of every match re.finditer(pattern, text) would yield, in order"""
+        stops = None
+        pos = 0
+        while True:
+            keyword = self.keyword_re.search(text, pos)
+            if not keyword:
+                return
+            if stops is None:
+                stops = self.stops(text)
+            start = keyword.start()
+            for word in self.keywords:
+                if not text.startswith(word, start):
+                    continue
+                i = bisect.bisect_left(stops, start + len(word))
+                # The first stop is always reachable: a comma is a stop itself
+                if i < len(stops):
+                    yield text[start:stops[i]]
+                    pos = stops[i]
+                    break
+            else:
+                pos = start + 1
+
+
+class LinearLocalityMatcher:
+    """Linear-time equivalent of re.search(pattern, text).group(1) for a greedy segment pattern.
+
+    Backtracking retries the greedy [^,]+ from every start position, which is
+    quadratic in the length of a comma-free segment. The match is always the
+    first segment with a keyword after its first character, extended to the
+    last such keyword, so one pass over the keyword positions finds it.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        self.keyword_re = re.compile('|'.join(re.escape(k) for k in keywords))
+        self.keyword_start_re = re.compile(f"(?={self.keyword_re.pattern})")
+
+    @classmethod
+    def from_pattern(cls, pattern: str) -> Optional['LinearLocalityMatcher']:
+        """Matcher for a pattern of the supported shape, or None if it has another shape"""
+        shape = GREEDY_SEGMENT_SHAPE.fullmatch(pattern)
+        return cls(shape.group(1).split('|')) if shape else None
+
+    def search(self, text: str) -> Optional[str]:
+        # Lookahead so overlapping keyword occurrences are all found
+        starts = [match.start() for match in self.keyword_start_re.finditer(text)]
+        segment_start = 0
+        while starts:
+            comma = text.find(',', segment_start)
+            segment_end = len(text) if comma < 0 else comma
+            lo = bisect.bisect_left(starts, segment_start + 1)
+            hi = bisect.bisect_left(starts, segment_end)
+            if hi > lo:
+                last = starts[hi - 1]
+                return text[segment_start:self.keyword_re.match(text, last).end()]
+            if comma < 0:
+                break
+            segment_start = comma + 1
+        return None
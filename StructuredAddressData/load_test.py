@@ -0,0 +1,100 @@
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from typing import Dict, List
+
+SAMPLE_ADDRESSES = [
+    "4, B, Sahil Sankul Appartment, Shramik Nagar, Satpur, Nashik, Maharashtra, India, 422012",
+    "D.NO: 3/138, ANDANKOVIL EAST ROAD, VADIVEL NAGAR, KARUR, IN-TN, 639008",
+    "H.NO 12-2-417, NEAR BUS STAND, GUNTUR, IN-AP, 522001",
+    "A-136, SECTOR 63, NOIDA, IN-UP, 201301",
+    "7th Floor, DLF CYBER CITY, PHASE 2, GURUGRAM, IN-HR, 122002",
+]
+
+
+def post_json(url: str, payload) -> Dict:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def run_load(base_url: str, concurrency: int, duration: float, bulk_size: int) -> Dict[str, float]:
+    """Hammer the service from concurrency threads for duration seconds"""
+    latencies: List[float] = []
+    errors = [0]
+    rows = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(worker_id: int):
+        i = worker_id
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                if bulk_size > 1:
+                    batch = [SAMPLE_ADDRESSES[(i + j) % len(SAMPLE_ADDRESSES)] for j in range(bulk_size)]
+                    post_json(f"{base_url}/parse/bulk", {'records': batch})
+                    n = bulk_size
+                else:
+                    post_json(f"{base_url}/parse", {'address': SAMPLE_ADDRESSES[i % len(SAMPLE_ADDRESSES)]})
+                    n = 1
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                rows[0] += n
+            i += concurrency
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+        'requests_per_sec': len(latencies) / elapsed,
+        'rows_per_sec': rows[0] / elapsed,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Load-test the local address parsing service")
+    arg_parser.add_argument('--url', default='http://127.0.0.1:8765')
+    arg_parser.add_argument('--concurrency', type=int, default=32)
+    arg_parser.add_argument('--duration', type=float, default=10.0)
+    arg_parser.add_argument('--bulk-size', type=int, default=1,
+                            help="records per request; 1 exercises the micro-batched /parse endpoint")
+    args = arg_parser.parse_args()
+
+    client_stats = run_load(args.url, args.concurrency, args.duration, args.bulk_size)
+    print("\nClient-side results:")
+    print("-" * 40)
+    for key, value in client_stats.items():
+        print(f"{key:18s}: {value:10.2f}")
+
+    with urllib.request.urlopen(f"{args.url}/stats", timeout=10) as response:
+        server_stats = json.loads(response.read())
+    print("\nServer-side results:")
+    print("-" * 40)
+    for key, value in server_stats.items():
+        print(f"{key:18s}: {value:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
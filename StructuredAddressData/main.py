@@ -3,7 +3,8 @@ import sqlite3
 import pandas as pd
 import os
 import logging
-import subprocess
+
+from pipeline import AddressPipeline
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -69,17 +70,15 @@ def save_to_csv(data, record_id):
 
 def run_processing_pipeline(input_file):
     try:
-        # Run parser.py
-        logger.info("Starting parser.py")
-        subprocess.run(['python', 'parser.py', input_file], check=True)
-        
-        # Run engine.py
-        logger.info("Starting engine.py")
-        subprocess.run(['python', 'engine.py', input_file], check=True)
+        # Parser and engine run in-process; no intermediate CSV between them
+        logger.info("Starting address pipeline")
+        name = os.path.splitext(os.path.basename(input_file))[0]
+        output_file = f'data/output/addresses_{name}.csv'
+        AddressPipeline().run(input_file, output_file)
         
-        logger.info("Processing pipeline completed successfully")
+        logger.info(f"Processing pipeline completed successfully; results in {output_file}")
         return True
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         logger.error(f"Error in processing pipeline: {str(e)}")
         return False
 
@@ -0,0 +1,287 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from transformers import AutoTokenizer, LlamaConfig, LlamaForTokenClassification
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "Josephgflowers/Address-Parser-Tinyllama-v1"
+QUANTIZED_CACHE_DIR = "models/quantized"
+
+FIELD_LABELS = ['O', 'BuildingNumber', 'StreetName', 'TownName', 'CountrySubDivision', 'PostCode', 'Country']
+
+WEIGHT_FILE_EXTENSIONS = ('.safetensors', '.bin', '.pt', '.pth', '.json')
+
+
+def configure_threads(intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None):
+    """Set torch CPU thread pools. Inter-op threads can only be set before the first parallel op."""
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads: {str(e)}")
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of every nn.Linear; activations stay fp32"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def tiny_config(vocab_size: int = 512) -> LlamaConfig:
+    """A small randomly initialised Llama token classifier for offline checks"""
+    return LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=64,
+        intermediate_size=172,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=256,
+        num_labels=len(FIELD_LABELS),
+        id2label=dict(enumerate(FIELD_LABELS)),
+        label2id={label: i for i, label in enumerate(FIELD_LABELS)},
+        pad_token_id=0,
+    )
+
+
+class CharTokenizer:
+    """Character-level stand-in for the model tokenizer, so tiny configs need no downloads"""
+
+    def __init__(self, vocab_size: int = 512):
+        self.vocab_size = vocab_size
+
+    def __call__(self, texts: List[str], max_length: int = 128, **kwargs) -> Dict[str, torch.Tensor]:
+        length = min(max_length, max((len(t) for t in texts), default=1)) or 1
+        input_ids = torch.zeros((len(texts), length), dtype=torch.long)
+        attention_mask = torch.zeros((len(texts), length), dtype=torch.long)
+        offsets = torch.zeros((len(texts), length, 2), dtype=torch.long)
+        for row, text in enumerate(texts):
+            for col, char in enumerate(text[:length]):
+                input_ids[row, col] = 1 + ord(char) % (self.vocab_size - 1)
+                attention_mask[row, col] = 1
+                offsets[row, col, 0] = col
+                offsets[row, col, 1] = col + 1
+        return {'input_ids': input_ids, 'attention_mask': attention_mask, 'offset_mapping': offsets}
+
+
+class AddressTagger:
+    """Token-classification model that labels address spans, optionally int8-quantized.
+
+    With quantize=True the Linear layers are dynamically quantized and the
+    result is cached under cache_dir, so later runs rebuild the skeleton from
+    the config and load int8 weights instead of quantizing again. The cache
+    file name carries a hash of the config, weight revision and torch
+    version, so a changed model never loads another model's weights.
+
+    Cached weights are loaded with weights_only=True, which only unpickles
+    tensors and plain containers; a file that needs anything else is
+    treated as invalid and rebuilt rather than executed.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, quantize: bool = False,
+                 cache_dir: str = QUANTIZED_CACHE_DIR, config: Optional[LlamaConfig] = None,
+                 tokenizer=None, intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None, max_length: int = 128, seed: int = 0,
+                 revision: Optional[str] = None):
+        logging.basicConfig(level=logging.INFO)
+        configure_threads(intra_op_threads, inter_op_threads)
+        self.model_name = model_name
+        self.quantize = quantize
+        self.cache_dir = cache_dir
+        self.max_length = max_length
+        self.revision = revision
+        self.seed = seed if config is not None else None
+
+        if config is not None:
+            # Offline mode: a seeded random model so fp32 and int8 start from the same weights
+            torch.manual_seed(seed)
+            self.config = config
+            self.tokenizer = tokenizer or CharTokenizer(config.vocab_size)
+            model = LlamaForTokenClassification(config)
+        else:
+            self.tokenizer = tokenizer or AutoTokenizer.from_pretrained(model_name, revision=revision)
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.config = LlamaConfig.from_pretrained(model_name, revision=revision)
+            model = None if quantize and os.path.exists(self.cache_path()) else self.load_pretrained()
+
+        if quantize:
+            model = self.load_quantized(model)
+        self.model = model.eval()
+        self.id2label = self.config.id2label
+
+    def load_pretrained(self) -> torch.nn.Module:
+        return LlamaForTokenClassification.from_pretrained(self.model_name, revision=self.revision)
+
+    def local_weight_files(self) -> List[Tuple[str, int, int]]:
+        """(name, size, mtime_ns) of the checkpoint files when model_name is a local directory"""
+        if not os.path.isdir(self.model_name):
+            return []
+        return sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                      for entry in os.scandir(self.model_name)
+                      if entry.is_file() and entry.name.endswith(WEIGHT_FILE_EXTENSIONS))
+
+    def weights_key(self) -> str:
+        """Hash of everything the int8 weights are derived from"""
+        source = {
+            'config': self.config.to_dict(),
+            # Hub downloads record the commit they resolved to; offline models are fixed by the seed
+            'revision': getattr(self.config, '_commit_hash', None) or self.revision,
+            # A local checkpoint has no commit, and retraining in place keeps its config
+            'files': self.local_weight_files(),
+            'seed': self.seed,
+            'torch': torch.__version__,
+        }
+        return hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def cache_path(self) -> str:
+        safe_name = self.model_name.replace('/', '--')
+        return os.path.join(self.cache_dir, f"{safe_name}-{self.weights_key()[:16]}-int8.pt")
+
+    def load_quantized(self, model: Optional[torch.nn.Module]) -> torch.nn.Module:
+        path = self.cache_path()
+        if os.path.exists(path):
+            try:
+                state_dict = torch.load(path, weights_only=True)
+                skeleton = quantize_model(LlamaForTokenClassification(self.config).eval())
+                skeleton.load_state_dict(state_dict)
+                logger.info(f"Loaded quantized weights from {path}")
+                return skeleton
+            except Exception as e:
+                logger.warning(f"Ignoring unusable quantized cache {path}: {str(e)}")
+            if model is None:
+                model = self.load_pretrained()
+
+        quantized = quantize_model(model.eval())
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + '.tmp'
+        torch.save(quantized.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved quantized weights to {path}")
+        return quantized
+
+    @torch.inference_mode()
+    def predict_labels(self, texts: List[str], batch_size: int = 32) -> List[List[Tuple[int, int, str]]]:
+        """(start, end, label) character spans for every token of every text"""
+        results = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            encoded = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_length,
+                                     return_tensors='pt', return_offsets_mapping=True)
+            offsets = encoded.pop('offset_mapping').tolist()
+            logits = self.model(input_ids=encoded['input_ids'], attention_mask=encoded['attention_mask']).logits
+            predictions = logits.argmax(dim=-1).tolist()
+            mask = encoded['attention_mask'].tolist()
+            for row in range(len(batch)):
+                spans = []
+                for col, label_id in enumerate(predictions[row]):
+                    begin, end = offsets[row][col]
+                    if mask[row][col] and end > begin:
+                        spans.append((begin, end, self.id2label[label_id]))
+                results.append(spans)
+        return results
+
+    def extract_fields(self, texts: List[str], batch_size: int = 32) -> List[Dict[str, str]]:
+        """Join the characters tagged with each label into one string per field"""
+        fields = []
+        for text, spans in zip(texts, self.predict_labels(texts, batch_size=batch_size)):
+            parts: Dict[str, List[Tuple[int, int]]] = {}
+            for begin, end, label in spans:
+                if label == 'O':
+                    continue
+                segments = parts.setdefault(label, [])
+                # Merge with the previous segment when only whitespace separates them
+                if segments and not text[segments[-1][1]:begin].strip():
+                    segments[-1] = (segments[-1][0], end)
+                else:
+                    segments.append((begin, end))
+            result = {label: '' for label in FIELD_LABELS[1:]}
+            for label, segments in parts.items():
+                result[label] = ' '.join(text[b:e].strip() for b, e in segments).strip()
+            fields.append(result)
+        return fields
+
+
+def sample_addresses(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    buildings = ['4, B, Sahil Sankul Appartment', 'D.NO: 3/138', 'A-136', 'H.NO 12-2-417', '7th Floor, DLF Cyber City']
+    streets = ['Andankovil East Road', 'Sector 63', 'Station Road', 'MG Road', 'Shramik Nagar, Satpur']
+    towns = [('Nashik', 'Maharashtra', '422012'), ('Karur', 'Tamil Nadu', '639008'), ('Noida', 'Uttar Pradesh', '201301'),
+             ('Guntur', 'Andhra Pradesh', '522001'), ('Gurugram', 'Haryana', '122002')]
+    addresses = []
+    for _ in range(count):
+        town, state, pin = rng.choice(towns)
+        addresses.append(f"{rng.choice(buildings)}, {rng.choice(streets)}, {town}, {state}, India, {pin}")
+    return addresses
+
+
+def time_extraction(tagger: AddressTagger, texts: List[str], batch_size: int) -> Tuple[List[Dict[str, str]], float]:
+    tagger.extract_fields(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    fields = tagger.extract_fields(texts, batch_size=batch_size)
+    return fields, len(texts) / (time.perf_counter() - start)
+
+
+def accuracy_speed_report(rows: int = 512, batch_size: int = 32, tiny: bool = False,
+                          model_name: str = MODEL_NAME, cache_dir: str = QUANTIZED_CACHE_DIR,
+                          intra_op_threads: Optional[int] = None,
+                          inter_op_threads: Optional[int] = None, revision: Optional[str] = None) -> Dict[str, float]:
+    """Compare fp32 and int8 field-level agreement and rows/s on the same inputs"""
+    configure_threads(intra_op_threads, inter_op_threads)
+    config = tiny_config() if tiny else None
+    if tiny:
+        model_name = 'tiny-random-llama'
+    texts = sample_addresses(rows)
+
+    fp32 = AddressTagger(model_name=model_name, config=config, cache_dir=cache_dir, revision=revision)
+    fp32_fields, fp32_rate = time_extraction(fp32, texts, batch_size)
+    int8 = AddressTagger(model_name=model_name, config=config, cache_dir=cache_dir, quantize=True,
+                         revision=revision)
+    int8_fields, int8_rate = time_extraction(int8, texts, batch_size)
+
+    report = {
+        'fp32_rows_per_sec': fp32_rate,
+        'int8_rows_per_sec': int8_rate,
+        'speedup': int8_rate / fp32_rate if fp32_rate else 0.0,
+        'row_agreement': 100 * sum(a == b for a, b in zip(fp32_fields, int8_fields)) / len(texts),
+    }
+    for label in FIELD_LABELS[1:]:
+        agree = sum(a[label] == b[label] for a, b in zip(fp32_fields, int8_fields))
+        report[f"{label}_agreement"] = 100 * agree / len(texts)
+    return report
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="fp32 vs int8 accuracy/speed report for the address tagger")
+    arg_parser.add_argument('--model', default=MODEL_NAME)
+    arg_parser.add_argument('--revision', default=None, help="model branch, tag or commit (default: main)")
+    arg_parser.add_argument('--tiny', action='store_true', help="use a tiny random model (no downloads)")
+    arg_parser.add_argument('--rows', type=int, default=512)
+    arg_parser.add_argument('--batch-size', type=int, default=32)
+    arg_parser.add_argument('--cache-dir', default=QUANTIZED_CACHE_DIR)
+    arg_parser.add_argument('--intra-op-threads', type=int, default=None)
+    arg_parser.add_argument('--inter-op-threads', type=int, default=None)
+    args = arg_parser.parse_args()
+
+    report = accuracy_speed_report(rows=args.rows, batch_size=args.batch_size, tiny=args.tiny,
+                                   model_name=args.model, cache_dir=args.cache_dir,
+                                   intra_op_threads=args.intra_op_threads,
+                                   inter_op_threads=args.inter_op_threads, revision=args.revision)
+    print("\nfp32 vs int8:")
+    print("-" * 40)
+    for key, value in report.items():
+        suffix = '%' if key.endswith('agreement') else ''
+        print(f"{key:32s}: {value:10.2f}{suffix}")
+
+
+if __name__ == "__main__":
+    main()
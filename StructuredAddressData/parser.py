@@ -1,14 +1,74 @@
 import pandas as pd
 import re
+import hashlib
+import json
 import logging
 import time
 import os
-from typing import Dict
+from typing import Dict, Iterator, List, Optional
+
+from json_reader import COORDINATE_COLUMNS, iter_json_chunks
+from linear_match import LinearLocalityMatcher, LinearStreetMatcher
+from reference_data import REFERENCE_FILE, STATE_MAPPING, fingerprint_sources, load_reference_data
+from result_store import RESULT_STORE_FILE, ResultStore, process_dataframe_cached
+
+INPUT_EXTENSIONS = ('.csv', '.json', '.ndjson', '.jsonl')
+
+REGEX_MODES = ('backtracking', 'linear')
+
+# At most one linear-fallback warning per this many seconds; the rows in between are counted into it
+FALLBACK_LOG_INTERVAL = 60.0
+
+ADDRESS_COLUMNS = [
+    'Entity.LegalAddress.FirstAddressLine',
+    'Entity.LegalAddress.AdditionalAddressLine.1',
+    'Entity.LegalAddress.AdditionalAddressLine.2',
+    'Entity.LegalAddress.AdditionalAddressLine.3',
+    'Entity.LegalAddress.City',
+    'Entity.LegalAddress.Region',
+    'Entity.LegalAddress.Country',
+    'Entity.LegalAddress.PostalCode'
+]
+
+# Alternation order matters: longer names must precede their prefixes (NEW DELHI before DELHI)
+CITY_NAMES = [
+    'NEW DELHI', 'DELHI', 'MUMBAI', 'BANGALORE', 'CHENNAI', 'KOLKATA', 'HYDERABAD', 'GURUGRAM',
+    'NOIDA', 'PUNE', 'AHMEDABAD', 'JAIPUR', 'SURAT', 'LUCKNOW', 'KANPUR', 'NAGPUR', 'INDORE',
+    'THANE', 'BHOPAL', 'VISAKHAPATNAM', 'PIMPRI-CHINCHWAD', 'PATNA', 'VADODARA', 'GHAZIABAD',
+    'LUDHIANA', 'AGRA', 'NASHIK', 'FARIDABAD', 'MEERUT', 'RAJKOT', 'KALYAN-DOMBIVALI',
+    'VASAI-VIRAR', 'VARANASI', 'SRINAGAR', 'AURANGABAD', 'DHANBAD', 'AMRITSAR', 'NAVI MUMBAI',
+    'ALLAHABAD', 'RANCHI', 'HOWRAH', 'JABALPUR', 'GWALIOR', 'VIJAYAWADA', 'JODHPUR', 'MADURAI',
+    'RAIPUR', 'KOTA', 'GUWAHATI', 'CHANDIGARH', 'SOLAPUR', 'HUBLI-DHARWAD', 'BAREILLY',
+    'MORADABAD', 'MYSORE', 'GURGAON', 'ALIGARH', 'JALANDHAR', 'TIRUCHIRAPPALLI', 'BHUBANESWAR',
+    'SALEM', 'MIRA-BHAYANDAR', 'THIRUVANANTHAPURAM', 'BHIWANDI', 'SAHARANPUR', 'GORAKHPUR',
+    'GUNTUR', 'BIKANER', 'AMRAVATI', 'NOIDA', 'JAMSHEDPUR', 'BHILAI', 'CUTTACK', 'FIROZABAD',
+    'KOCHI', 'NELLORE', 'BHAVNAGAR', 'DEHRADUN', 'DURGAPUR', 'ASANSOL', 'ROURKELA', 'NANDED',
+    'KOLHAPUR', 'AJMER', 'AKOLA', 'GULBARGA', 'JAMNAGAR', 'UJJAIN', 'LONI', 'SILIGURI', 'JHANSI',
+    'ULHASNAGAR', 'JAMMU', 'SANGLI-MIRAJ', 'MANGALORE', 'ERODE', 'BELGAUM', 'AMBATTUR',
+    'TIRUNELVELI', 'MALEGAON', 'GAYA', 'JALGAON', 'UDAIPUR', 'MAHESHTALA'
+]
 
 class AddressParser:
-    def _init_(self):
+    def __init__(self, regex_mode: str = 'backtracking', max_segment_length: Optional[int] = 200,
+                 reference_file: str = REFERENCE_FILE):
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
+        if regex_mode not in REGEX_MODES:
+            raise ValueError(f"regex_mode must be one of {REGEX_MODES}, got {regex_mode!r}")
+        self.regex_mode = regex_mode
+        self.max_segment_length = max_segment_length
+        self.regex_fallbacks = 0
+        self.unreported_fallbacks = 0
+        self.last_fallback_warning = None
+        self.row_linear = regex_mode == 'linear'
+
+        # City names come from the reference artifact when it was built from the current tables,
+        # else from CITY_NAMES, so an edit to the list takes effect before the next rebuild
+        city_names = CITY_NAMES
+        reference = load_reference_data(reference_file, fingerprint_sources(STATE_MAPPING, CITY_NAMES))
+        if reference:
+            city_names = reference.cities()
+            reference.close()
         
         # Original patterns dictionary remains the same
         self.patterns = {
@@ -44,10 +104,15 @@ class AddressParser:
             ],
             'city': [
                 r'(?:DISTRICT|DIST|TALUK|TEHSIL)\s*[-:]?\s*([^,]+)',
-                r'\b(?:NEW DELHI|DELHI|MUMBAI|BANGALORE|CHENNAI|KOLKATA|HYDERABAD|GURUGRAM|NOIDA|PUNE|AHMEDABAD|JAIPUR|SURAT|LUCKNOW|KANPUR|NAGPUR|INDORE|THANE|BHOPAL|VISAKHAPATNAM|PIMPRI-CHINCHWAD|PATNA|VADODARA|GHAZIABAD|LUDHIANA|AGRA|NASHIK|FARIDABAD|MEERUT|RAJKOT|KALYAN-DOMBIVALI|VASAI-VIRAR|VARANASI|SRINAGAR|AURANGABAD|DHANBAD|AMRITSAR|NAVI MUMBAI|ALLAHABAD|RANCHI|HOWRAH|JABALPUR|GWALIOR|VIJAYAWADA|JODHPUR|MADURAI|RAIPUR|KOTA|GUWAHATI|CHANDIGARH|SOLAPUR|HUBLI-DHARWAD|BAREILLY|MORADABAD|MYSORE|GURGAON|ALIGARH|JALANDHAR|TIRUCHIRAPPALLI|BHUBANESWAR|SALEM|MIRA-BHAYANDAR|THIRUVANANTHAPURAM|BHIWANDI|SAHARANPUR|GORAKHPUR|GUNTUR|BIKANER|AMRAVATI|NOIDA|JAMSHEDPUR|BHILAI|CUTTACK|FIROZABAD|KOCHI|NELLORE|BHAVNAGAR|DEHRADUN|DURGAPUR|ASANSOL|ROURKELA|NANDED|KOLHAPUR|AJMER|AKOLA|GULBARGA|JAMNAGAR|UJJAIN|LONI|SILIGURI|JHANSI|ULHASNAGAR|JAMMU|SANGLI-MIRAJ|MANGALORE|ERODE|BELGAUM|AMBATTUR|TIRUNELVELI|MALEGAON|GAYA|JALGAON|UDAIPUR|MAHESHTALA)\b'
+                r'\b(?:' + '|'.join(city_names) + r')\b'
             ]
         }
 
+        # Linear-time equivalents of the patterns that backtrack on long comma-free text;
+        # None for patterns of another shape, which always run through re
+        self.street_matchers = [LinearStreetMatcher.from_pattern(p) for p in self.patterns['street_address']]
+        self.locality_matchers = [LinearLocalityMatcher.from_pattern(p) for p in self.patterns['locality']]
+
     # Original methods remain the same
     def clean_text(self, text: str) -> str:
         text = text.upper()
@@ -58,6 +123,7 @@ class AddressParser:
     def extract_components(self, text: str) -> Dict[str, str]:
         # Original extract_components method remains the same
         text = self.clean_text(text)
+        self.row_linear = self.regex_mode == 'linear' or self.needs_linear(text)
         components = {
             'BuildingNumber': '',
             'StreetAddress': '',
@@ -85,14 +151,7 @@ class AddressParser:
                     text = text.replace(match.group(1), '')
                     break
 
-            street_parts = []
-            for pattern in self.patterns['street_address']:
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    street_part = match.group(0).strip()
-                    if street_part and street_part not in street_parts:
-                        street_parts.append(street_part)
-            components['StreetAddress'] = ', '.join(street_parts)
+            components['StreetAddress'] = ', '.join(self.extract_street_parts(text))
 
             for pattern in self.patterns['landmark']:
                 match = re.search(pattern, text)
@@ -103,7 +162,13 @@ class AddressParser:
                         components['Landmark'] = match.group(0).strip()
                     break
 
-            for pattern in self.patterns['locality']:
+            for pattern, matcher in zip(self.patterns['locality'], self.locality_matchers):
+                if self.row_linear and matcher is not None:
+                    locality = matcher.search(text)
+                    if locality is not None:
+                        components['Locality'] = locality.strip()
+                        break
+                    continue
                 match = re.search(pattern, text)
                 if match:
                     if match.groups():
@@ -137,21 +202,80 @@ class AddressParser:
         components = {k: v.strip() if v else '' for k, v in components.items()}
         return components
 
+    def needs_linear(self, text: str) -> bool:
+        """Whether a row must skip the backtracking patterns.
+
+        Their cost grows with the square of the longest comma-free run and re cannot be
+        interrupted mid-search, so the choice is made before any of them runs.
+        """
+        if not self.max_segment_length:
+            return False
+        longest = max(len(segment) for segment in text.split(','))
+        if longest <= self.max_segment_length:
+            return False
+        self.regex_fallbacks += 1
+        self.unreported_fallbacks += 1
+        now = time.monotonic()
+        if self.last_fallback_warning is None or now - self.last_fallback_warning >= FALLBACK_LOG_INTERVAL:
+            self.logger.warning(f"{self.unreported_fallbacks} row(s) with a comma-free run over "
+                                f"{self.max_segment_length} chars (latest {longest}) used linear matching")
+            self.last_fallback_warning = now
+            self.unreported_fallbacks = 0
+        return True
+
+    def extract_street_parts(self, text: str) -> List[str]:
+        """Street matches in pattern order, deduplicated"""
+        street_parts = []
+        for pattern, matcher in zip(self.patterns['street_address'], self.street_matchers):
+            if self.row_linear and matcher is not None:
+                matches = list(matcher.finditer(text))
+            else:
+                matches = [match.group(0) for match in re.finditer(pattern, text)]
+            for street_part in matches:
+                street_part = street_part.strip()
+                if street_part and street_part not in street_parts:
+                    street_parts.append(street_part)
+        return street_parts
+
+    def build_full_address(self, row: pd.Series) -> str:
+        """Join the non-empty address columns of an input row"""
+        return " ".join([str(row.get(col, '')) for col in ADDRESS_COLUMNS if pd.notna(row.get(col, ''))])
+
+    def fingerprint(self) -> str:
+        """Hash of the active pattern set; cached results from other patterns are stale"""
+        return hashlib.sha256(json.dumps(self.patterns, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def cacheable(self, df: pd.DataFrame) -> List[bool]:
+        """Parsing depends only on the row and the pattern set"""
+        return [True] * len(df)
+
+    def text_column(self, df: pd.DataFrame, column: str) -> List[Optional[str]]:
+        """str() of each value in a column, None where missing"""
+        if column not in df.columns:
+            return [None] * len(df)
+        values = df[column]
+        return [text if present else None for text, present in zip(values.astype(str), values.notna())]
+
+    def cache_keys(self, df: pd.DataFrame) -> List[str]:
+        """Per-row hash of everything that shapes the parsed output, built column-wise"""
+        parts = [self.text_column(df, column) for column in ADDRESS_COLUMNS]
+        cities = self.text_column(df, 'Entity.LegalAddress.City')
+        coordinates = [self.text_column(df, column) for column in COORDINATE_COLUMNS]
+        keys = []
+        for address, city, point in zip(zip(*parts), cities, zip(*coordinates)):
+            # Same text as clean_text(build_full_address(row))
+            normalized = self.clean_text(' '.join(part for part in address if part is not None))
+            key = f"{normalized}\x1f{city.strip().upper() if city is not None else ''}"
+            # Coordinates are passed through to the output, so they are part of the key
+            if any(point):
+                key = '\x1f'.join([key] + [value or '' for value in point])
+            keys.append(hashlib.sha256(key.encode('utf-8')).hexdigest())
+        return keys
+
     def process_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         # Original process_dataframe method remains the same
         self.logger.info(f"Number of rows received in process_dataframe: {len(df)}")
 
-        address_columns = [
-            'Entity.LegalAddress.FirstAddressLine',
-            'Entity.LegalAddress.AdditionalAddressLine.1',
-            'Entity.LegalAddress.AdditionalAddressLine.2',
-            'Entity.LegalAddress.AdditionalAddressLine.3',
-            'Entity.LegalAddress.City',
-            'Entity.LegalAddress.Region',
-            'Entity.LegalAddress.Country',
-            'Entity.LegalAddress.PostalCode'
-        ]
-
         parsed_addresses = []
 
         for idx, row in df.iterrows():
@@ -160,7 +284,7 @@ class AddressParser:
                 start_time = time.time()
 
                 self.current_row = row
-                full_address = " ".join([str(row.get(col, '')) for col in address_columns if pd.notna(row.get(col, ''))])
+                full_address = self.build_full_address(row)
                 parsed = self.extract_components(full_address)
                 parsed_addresses.append(parsed)
 
@@ -171,48 +295,88 @@ class AddressParser:
                 self.logger.error(f"Error processing row {idx + 1}: {str(e)}")
                 parsed_addresses.append({k: '' for k in self.extract_components('').keys()})
 
-        return pd.DataFrame(parsed_addresses)
+        result_df = pd.DataFrame(parsed_addresses)
+        # Input coordinates pass straight through for the engine's nearest-PIN fill
+        for column in COORDINATE_COLUMNS:
+            if column in df.columns:
+                result_df[column] = df[column].to_numpy()
+        return result_df
+
+def find_input_file(file_number: str, input_dir: str = "data/input") -> str:
+    """Locate data/input/{n} with any supported extension"""
+    for ext in INPUT_EXTENSIONS:
+        candidate = os.path.join(input_dir, f"{file_number}{ext}")
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"Input file {os.path.join(input_dir, file_number)}.csv/.json not found")
 
-def process_file(file_number: str, sample_size: int = 5000):
+def iter_input_chunks(input_file: str, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    """Yield the input file as DataFrame chunks, whether CSV or nested JSON/NDJSON"""
+    if input_file.lower().endswith(INPUT_EXTENSIONS[1:]):
+        yield from iter_json_chunks(input_file, chunksize=chunksize)
+    else:
+        yield from pd.read_csv(input_file, low_memory=False, chunksize=chunksize)
+
+def parse_file(parser: AddressParser, input_file: str, output_file: str,
+               chunksize: int = 10000, sample_size: Optional[int] = None,
+               store: Optional[ResultStore] = None) -> int:
+    """Parse an input file chunk by chunk, appending results to output_file. Returns rows written."""
+    rows = 0
+    header = True
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        for chunk in iter_input_chunks(input_file, chunksize=chunksize):
+            if sample_size is not None:
+                chunk = chunk.head(sample_size - rows)
+                if chunk.empty:
+                    break
+            if store is not None:
+                structured_df = process_dataframe_cached(parser, chunk, store)
+            else:
+                structured_df = parser.process_dataframe(chunk)
+            structured_df.to_csv(out, index=False, header=header)
+            header = False
+            rows += len(structured_df)
+    return rows
+
+def process_file(file_number: str, sample_size: int = 5000, cache_file: Optional[str] = RESULT_STORE_FILE,
+                 regex_mode: str = 'backtracking') -> Optional[int]:
+    """Parse data/input/{file_number} into data/output. Returns rows written, or None on error."""
     try:
-        parser = AddressParser()
+        parser = AddressParser(regex_mode=regex_mode)
+        store = ResultStore(cache_file, namespace='parser', fingerprint=parser.fingerprint()) if cache_file else None
         
         # Create directories if they don't exist
         os.makedirs("data/input", exist_ok=True)
         os.makedirs("data/output", exist_ok=True)
         
-        input_file = f"data/input/{file_number}.csv"
+        input_file = find_input_file(file_number)
         print(f"Processing file: {input_file}")
-        
-        if not os.path.exists(input_file):
-            raise FileNotFoundError(f"Input file {input_file} not found")
-            
-        df = pd.read_csv(input_file, low_memory=False)
-        print(f"Total records in CSV: {len(df)}")
-
-        df_sample = df.head(sample_size)
-        print(f"Processing {sample_size} records...")
 
-        structured_df = parser.process_dataframe(df_sample)
+        print(f"Processing up to {sample_size} records...")
 
         output_file = f"data/output/structured_addresses_{file_number}.csv"
-        structured_df.to_csv(output_file, index=False)
+        rows = parse_file(parser, input_file, output_file, sample_size=sample_size, store=store)
+        print(f"Total records processed: {rows}")
+        if store is not None:
+            store.display_stats()
+            store.close()
 
         print(f"Results saved to {output_file}")
-        return structured_df
+        return rows
 
     except Exception as e:
         print(f"Error processing file {file_number}: {str(e)}")
         return None
 
-if __name__ == "_main_":
+if __name__ == "__main__":
     import sys
     
     if len(sys.argv) > 1:
         file_number = sys.argv[1]  # Accept file number as command line argument
-        df = process_file(file_number)
-        if df is not None:
+        rows = process_file(file_number)
+        if rows:
+            output_file = f"data/output/structured_addresses_{file_number}.csv"
             print("\nSample of processed addresses:")
-            print(df.head().to_string())
+            print(pd.read_csv(output_file, nrows=5, dtype=str, keep_default_na=False).to_string())
     else:
-        print("Please provide a file number (e.g., python script.py 16)")
\ No newline at end of file
+        print("Please provide a file number (e.g., python script.py 16)")
@@ -0,0 +1,202 @@
+import argparse
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+import engine
+import parser
+from json_reader import COORDINATE_COLUMNS, LEGAL_ADDRESS_COLUMNS, flatten_record
+from result_store import ResultStore, process_dataframe_cached
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+Record = Union[str, Dict]
+
+OUTPUT_FORMATS = ('csv', 'arrow')
+
+
+def to_legal_address(record: Record) -> Dict[str, str]:
+    """Accept a free-text address, a flat Entity.LegalAddress.* dict or a nested record"""
+    if isinstance(record, str):
+        flat = {column: '' for column in LEGAL_ADDRESS_COLUMNS + COORDINATE_COLUMNS}
+        flat['Entity.LegalAddress.FirstAddressLine'] = record
+        return flat
+    if not isinstance(record, dict):
+        raise ValueError(f"Unsupported record type: {type(record).__name__}")
+    if 'address' in record or 'location' in record:
+        return flatten_record(record)
+    flat = {column: '' for column in LEGAL_ADDRESS_COLUMNS + COORDINATE_COLUMNS}
+    for column in flat:
+        if record.get(column) is not None:
+            flat[column] = str(record[column])
+    return flat
+
+
+class AddressPipeline:
+    """Regex extraction and engine enrichment in one process. Not thread-safe; see service.AddressService.
+
+    The parser's column frame is handed straight to the engine, which maps it
+    to the output schema through engine.INPUT_COLUMN_MAP, so no intermediate
+    file is written unless debug_dir is set.
+    """
+
+    def __init__(self, regex_mode: str = 'backtracking', vectorized: bool = True,
+                 debug_dir: Optional[str] = None, cache_file: Optional[str] = None,
+                 address_engine: Optional[engine.AddressParser] = None, use_geocoder: bool = False,
+                 cache_enrich: bool = False):
+        logging.basicConfig(level=logging.INFO)
+        self.parser = parser.AddressParser(regex_mode=regex_mode)
+        self.engine = address_engine or engine.AddressParser(use_geocoder=use_geocoder)
+        self.parser.logger.setLevel(logging.WARNING)
+        self.vectorized = vectorized
+        self.debug_dir = debug_dir
+        self.parser_store = self.engine_store = None
+        if cache_file:
+            self.parser_store = ResultStore(cache_file, namespace='parser', fingerprint=self.parser.fingerprint())
+        if cache_file and cache_enrich:
+            # Off by default: a warm enrich cache is still slower than vectorized recomputation
+            self.engine_store = ResultStore(cache_file, namespace='engine', fingerprint=self.engine.fingerprint())
+        self.stage_seconds = {'parse': 0.0, 'enrich': 0.0, 'write': 0.0}
+
+    def parse(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.parser_store is not None:
+            return process_dataframe_cached(self.parser, df, self.parser_store)
+        return self.parser.process_dataframe(df)
+
+    def enrich(self, structured_df: pd.DataFrame) -> pd.DataFrame:
+        if self.engine_store is not None:
+            return process_dataframe_cached(self.engine, structured_df, self.engine_store,
+                                            verbose=False, vectorized=self.vectorized)
+        return self.engine.process_dataframe(structured_df, verbose=False, vectorized=self.vectorized)
+
+    def process_chunk(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Raw Entity.LegalAddress.* rows in; enriched and intermediate structured frames out"""
+        start = time.perf_counter()
+        structured_df = self.parse(df)
+        self.stage_seconds['parse'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result_df = self.enrich(structured_df)
+        self.stage_seconds['enrich'] += time.perf_counter() - start
+        return result_df, structured_df
+
+    def parse_records(self, records: List[Record]) -> List[Dict[str, str]]:
+        df = pd.DataFrame([to_legal_address(r) for r in records], columns=LEGAL_ADDRESS_COLUMNS + COORDINATE_COLUMNS)
+        result_df, _ = self.process_chunk(df)
+        return result_df.to_dict(orient='records')
+
+    def run(self, input_file: str, output_file: str, chunksize: int = 10000,
+            sample_size: Optional[int] = None, output_format: str = 'csv') -> int:
+        """Parse and enrich an input file chunk by chunk into output_file. Returns rows written."""
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+        if output_format == 'arrow' and pa is None:
+            raise ImportError("Arrow output requires pyarrow; install it or use output_format='csv'")
+
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        debug_file = None
+        if self.debug_dir:
+            os.makedirs(self.debug_dir, exist_ok=True)
+            name = os.path.splitext(os.path.basename(input_file))[0]
+            debug_file = open(os.path.join(self.debug_dir, f"structured_addresses_{name}.csv"),
+                              'w', newline='', encoding='utf-8')
+
+        tmp_file = output_file + '.tmp'
+        if output_format == 'arrow':
+            out = open(tmp_file, 'wb')
+        else:
+            out = open(tmp_file, 'w', newline='', encoding='utf-8')
+
+        rows = 0
+        writer = None
+        try:
+            for chunk in parser.iter_input_chunks(input_file, chunksize=chunksize):
+                if sample_size is not None:
+                    chunk = chunk.head(sample_size - rows)
+                    if chunk.empty:
+                        break
+                result_df, structured_df = self.process_chunk(chunk)
+
+                start = time.perf_counter()
+                if debug_file is not None:
+                    structured_df.to_csv(debug_file, index=False, header=rows == 0)
+                if output_format == 'arrow':
+                    # All-string columns keep one schema across batches
+                    batch = pa.RecordBatch.from_pandas(result_df.astype(str), preserve_index=False)
+                    if writer is None:
+                        writer = pa_ipc.new_stream(out, batch.schema)
+                    writer.write_batch(batch)
+                else:
+                    result_df.to_csv(out, index=False, header=rows == 0)
+                self.stage_seconds['write'] += time.perf_counter() - start
+                rows += len(result_df)
+            if writer is not None:
+                writer.close()
+            out.close()
+            os.replace(tmp_file, output_file)
+        finally:
+            out.close()
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            if debug_file is not None:
+                debug_file.close()
+        return rows
+
+    def display_stats(self, rows: int):
+        total = sum(self.stage_seconds.values())
+        print(f"\n{rows} rows in {total:.2f}s ({rows / total if total else 0.0:.0f} rows/s)")
+        print("\nStage time:")
+        print("-" * 40)
+        for stage, seconds in self.stage_seconds.items():
+            print(f"{stage:15s}: {seconds:8.2f}s")
+        for store in (self.parser_store, self.engine_store):
+            if store is not None:
+                store.display_stats()
+
+    def close(self):
+        for store in (self.parser_store, self.engine_store):
+            if store is not None:
+                store.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Parse and enrich addresses in one pass, without intermediate files")
+    arg_parser.add_argument('input', help="input file, or a file number under data/input")
+    arg_parser.add_argument('--output', default=None, help="default: data_output/addresses_<name>.csv")
+    arg_parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help="arrow writes an Arrow IPC stream")
+    arg_parser.add_argument('--chunksize', type=int, default=10000)
+    arg_parser.add_argument('--sample-size', type=int, default=None)
+    arg_parser.add_argument('--regex-mode', choices=parser.REGEX_MODES, default='backtracking')
+    arg_parser.add_argument('--rowwise', action='store_true', help="use per-row enrichment instead of vectorized")
+    arg_parser.add_argument('--debug-dir', default=None, help="also dump the parser's structured output as CSV here")
+    arg_parser.add_argument('--cache-file', default=None, help="persistent result store for the parse stage")
+    arg_parser.add_argument('--cache-enrich', action='store_true', help="also cache enrichment results in --cache-file")
+    arg_parser.add_argument('--geocode', action='store_true',
+                            help="look up PINs missing from the local index online (rate-limited to 1/s)")
+    args = arg_parser.parse_args()
+
+    input_file = args.input if os.path.exists(args.input) else parser.find_input_file(args.input)
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    output_file = args.output or f"data_output/addresses_{name}.{'arrow' if args.format == 'arrow' else 'csv'}"
+
+    pipeline = AddressPipeline(regex_mode=args.regex_mode, vectorized=not args.rowwise,
+                               debug_dir=args.debug_dir, cache_file=args.cache_file, use_geocoder=args.geocode,
+                               cache_enrich=args.cache_enrich)
+    rows = pipeline.run(input_file, output_file, chunksize=args.chunksize,
+                        sample_size=args.sample_size, output_format=args.format)
+    pipeline.display_stats(rows)
+    pipeline.close()
+    print(f"\nResults saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_FILE = "data/reference/reference.bin"
+
+MAGIC = b'SADREF01'
+FORMAT_VERSION = 3
+
+# magic, format version, section count, payload length, sha256 of payload, source fingerprint, PIN digest
+HEADER = struct.Struct('<8sIIQ32s32s32s')
+# section name, kind, item count, offset into payload, byte length
+SECTION = struct.Struct('<24sIIQQ')
+
+KIND_STRINGS = 1
+KIND_FLOAT64 = 2
+KIND_INT64 = 3
+KIND_UINT32 = 4
+
+# memoryview cast format of each fixed-width kind
+KIND_FORMATS = {KIND_FLOAT64: 'd', KIND_INT64: 'q', KIND_UINT32: 'I'}
+
+# Grid cell edge in degrees, matching spatial_index.PinSpatialIndex's default
+GRID_CELL_SIZE = 0.1
+
+# Full state name -> accepted codes and spellings; with parser.CITY_NAMES, the code-defined sources
+STATE_MAPPING = {
+    'ANDHRA PRADESH': ['AP', 'ANDHRA', 'A.P.'],
+    'ARUNACHAL PRADESH': ['AR', 'ARUNACHAL'],
+    'ASSAM': ['AS'],
+    'BIHAR': ['BR'],
+    'CHHATTISGARH': ['CG', 'CT'],
+    'GOA': ['GA'],
+    'GUJARAT': ['GJ'],
+    'HARYANA': ['HR'],
+    'HIMACHAL PRADESH': ['HP'],
+    'JHARKHAND': ['JH'],
+    'KARNATAKA': ['KA', 'KAR'],
+    'KERALA': ['KL', 'KER'],
+    'MADHYA PRADESH': ['MP'],
+    'MAHARASHTRA': ['MH', 'MAHA'],
+    'MANIPUR': ['MN'],
+    'MEGHALAYA': ['ML'],
+    'MIZORAM': ['MZ'],
+    'NAGALAND': ['NL'],
+    'ODISHA': ['OR', 'OD'],
+    'PUNJAB': ['PB'],
+    'RAJASTHAN': ['RJ'],
+    'SIKKIM': ['SK'],
+    'TAMIL NADU': ['TN', 'TAMILNADU', 'T.N.'],
+    'TELANGANA': ['TS', 'TG', 'TELENGANA'],
+    'TRIPURA': ['TR'],
+    'UTTAR PRADESH': ['UP'],
+    'UTTARAKHAND': ['UK', 'UA'],
+    'WEST BENGAL': ['WB'],
+    'DELHI': ['DL', 'NCT', 'NCT OF DELHI', 'DELHI NCT'],
+    'JAMMU AND KASHMIR': ['JK'],
+    'LADAKH': ['LA'],
+    'PUDUCHERRY': ['PY', 'PONDICHERRY'],
+    'ANDAMAN AND NICOBAR ISLANDS': ['AN'],
+    'CHANDIGARH': ['CH'],
+    'DADRA AND NAGAR HAVELI AND DAMAN AND DIU': ['DN', 'DD'],
+    'LAKSHADWEEP': ['LD']
+}
+
+
+class ReferenceDataError(Exception):
+    """Raised when an artifact is missing, corrupt or built for another format version"""
+
+
+class StringTable:
+    """Read-only view of count strings stored as a uint32 offset array plus a UTF-8 blob"""
+
+    def __init__(self, buffer: memoryview, count: int):
+        self.count = count
+        self.offsets = buffer[:(count + 1) * 4].cast('I')
+        self.blob = buffer[(count + 1) * 4:]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def raw(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def find(self, key: str) -> int:
+        """Index of key in a table written in sorted order, or -1"""
+        target = key.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.count and self.raw(lo) == target else -1
+
+
+def encode_strings(values: Sequence[str]) -> bytes:
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = [0]
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    return struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(encoded)
+
+
+def encode_floats(values: Sequence[float]) -> bytes:
+    return struct.pack(f'<{len(values)}d', *values)
+
+
+def grid_key(ci: int, cj: int) -> int:
+    """One sortable int64 per (lat, lon) grid cell"""
+    return (ci << 32) + cj
+
+
+def encode_grid(lats: Sequence[float], lons: Sequence[float], cell_size: float) -> Tuple[List[int], List[int], List[int]]:
+    """Sorted cell keys, per-cell offsets into the member list, and PIN indices grouped by cell"""
+    cells: Dict[int, List[int]] = {}
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        key = grid_key(int(math.floor(lat / cell_size)), int(math.floor(lon / cell_size)))
+        cells.setdefault(key, []).append(i)
+    keys = sorted(cells)
+    offsets = [0]
+    members: List[int] = []
+    for key in keys:
+        members.extend(cells[key])
+        offsets.append(len(members))
+    return keys, offsets, members
+
+
+def fingerprint_sources(state_mapping: Dict[str, List[str]], cities: Sequence[str]) -> bytes:
+    """Digest of the tables defined in code, used to detect a build from older code"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(state_mapping, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(list(cities)).encode('utf-8'))
+    return digest.digest()
+
+
+def digest_pins(pins: Iterable[Tuple[str, float, float, str, str]]) -> bytes:
+    """Content hash of PIN centroids, independent of file path, row order and mtime"""
+    digest = hashlib.sha256()
+    for pincode, lat, lon, town, state in sorted(pins, key=lambda p: p[0].encode('utf-8')):
+        digest.update(f"{pincode}\x1f{lat!r}\x1f{lon!r}\x1f{town}\x1f{state}\x1e".encode('utf-8'))
+    return digest.digest()
+
+
+def build_artifact(output_file: str, state_mapping: Dict[str, List[str]], cities: Sequence[str],
+                   pins: Sequence[Tuple[str, float, float, str, str]] = (),
+                   source_fingerprint: bytes = b'\0' * 32, pin_source: str = '',
+                   cell_size: float = GRID_CELL_SIZE) -> int:
+    """Write all reference tables to one checksummed binary file. Returns its size.
+
+    The PIN digest and the path the PINs were read from are recorded in the
+    artifact, so loaders trust its PIN tables instead of re-reading a CSV.
+    """
+    code_to_name = {}
+    for state, codes in state_mapping.items():
+        for code in codes:
+            code_to_name[code.upper()] = state
+        code_to_name[state] = state
+    state_codes = sorted(code_to_name, key=lambda k: k.encode('utf-8'))
+    pins = sorted(pins, key=lambda p: p[0].encode('utf-8'))
+    grid_keys, grid_offsets, grid_members = encode_grid([p[1] for p in pins], [p[2] for p in pins], cell_size)
+
+    sections = [
+        ('state_codes', KIND_STRINGS, len(state_codes), encode_strings(state_codes)),
+        ('state_code_names', KIND_STRINGS, len(state_codes), encode_strings([code_to_name[c] for c in state_codes])),
+        ('state_names', KIND_STRINGS, len(state_mapping), encode_strings(list(state_mapping))),
+        ('state_variants', KIND_STRINGS, len(state_mapping), encode_strings(['|'.join(v) for v in state_mapping.values()])),
+        ('cities', KIND_STRINGS, len(cities), encode_strings(list(cities))),
+        ('pin_codes', KIND_STRINGS, len(pins), encode_strings([p[0] for p in pins])),
+        ('pin_lats', KIND_FLOAT64, len(pins), encode_floats([p[1] for p in pins])),
+        ('pin_lons', KIND_FLOAT64, len(pins), encode_floats([p[2] for p in pins])),
+        ('pin_towns', KIND_STRINGS, len(pins), encode_strings([p[3] for p in pins])),
+        ('pin_states', KIND_STRINGS, len(pins), encode_strings([p[4] for p in pins])),
+        ('pin_source', KIND_STRINGS, 1, encode_strings([pin_source])),
+        ('grid_cell_size', KIND_FLOAT64, 1, encode_floats([cell_size])),
+        ('grid_keys', KIND_INT64, len(grid_keys), struct.pack(f'<{len(grid_keys)}q', *grid_keys)),
+        ('grid_offsets', KIND_UINT32, len(grid_offsets), struct.pack(f'<{len(grid_offsets)}I', *grid_offsets)),
+        ('grid_members', KIND_UINT32, len(grid_members), struct.pack(f'<{len(grid_members)}I', *grid_members)),
+    ]
+
+    directory = bytearray()
+    body = bytearray()
+    base = len(sections) * SECTION.size
+    for name, kind, count, data in sections:
+        # Keep every section 8-byte aligned so the arrays can be cast in place
+        body += b'\0' * (-len(body) % 8)
+        directory += SECTION.pack(name.encode('ascii'), kind, count, base + len(body), len(data))
+        body += data
+    payload = bytes(directory + body)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), len(payload),
+                         hashlib.sha256(payload).digest(), source_fingerprint, digest_pins(pins))
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_file, output_file)
+    return len(header) + len(payload)
+
+
+class ReferenceData:
+    """Memory-mapped reference artifact.
+
+    Pages are mapped read-only, so every process opening the same file
+    shares one copy through the OS page cache.
+    """
+
+    def __init__(self, path: str = REFERENCE_FILE, verify: bool = True):
+        self.path = path
+        if not os.path.exists(path):
+            raise ReferenceDataError(f"Reference artifact {path} not found; run reference_data.py build")
+
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = view = memoryview(self.mmap)
+        if len(view) < HEADER.size:
+            raise ReferenceDataError(f"{path} is truncated")
+
+        (magic, version, section_count, payload_length, checksum,
+         self.source_fingerprint, self.pin_digest) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ReferenceDataError(f"{path} is not a reference artifact")
+        if version != FORMAT_VERSION:
+            raise ReferenceDataError(f"{path} has format version {version}, expected {FORMAT_VERSION}; rebuild it")
+        payload = view[HEADER.size:HEADER.size + payload_length]
+        if len(payload) != payload_length:
+            raise ReferenceDataError(f"{path} is truncated")
+        if verify and hashlib.sha256(payload).digest() != checksum:
+            raise ReferenceDataError(f"{path} failed its checksum; rebuild it")
+
+        self.sections = {}
+        for i in range(section_count):
+            name, kind, count, offset, length = SECTION.unpack_from(payload, i * SECTION.size)
+            data = payload[offset:offset + length]
+            if kind == KIND_STRINGS:
+                section = StringTable(data, count)
+            else:
+                section = data.cast(KIND_FORMATS[kind])
+            self.sections[name.rstrip(b'\0').decode('ascii')] = section
+
+    def is_stale(self, source_fingerprint: bytes) -> bool:
+        """True if the code-defined tables changed since the build; the PIN tables are the artifact's own"""
+        return self.source_fingerprint != source_fingerprint
+
+    def pin_source(self) -> str:
+        """Path of the PIN CSV this artifact was built from"""
+        return self.sections['pin_source'][0]
+
+    def state_mapping(self) -> Dict[str, List[str]]:
+        names, variants = self.sections['state_names'], self.sections['state_variants']
+        return {names[i]: variants[i].split('|') if variants[i] else [] for i in range(len(names))}
+
+    def state_code_to_name(self) -> Dict[str, str]:
+        return dict(zip(self.sections['state_codes'], self.sections['state_code_names']))
+
+    def convert_state_code(self, state_code: str) -> Optional[str]:
+        i = self.sections['state_codes'].find(state_code.upper().strip())
+        return self.sections['state_code_names'][i] if i >= 0 else None
+
+    def cities(self) -> List[str]:
+        return list(self.sections['cities'])
+
+    def pin_count(self) -> int:
+        return len(self.sections['pin_codes'])
+
+    def pin_index_of(self, pincode: str) -> int:
+        """Row of a PIN in the pin_* sections, or -1"""
+        return self.sections['pin_codes'].find(pincode)
+
+    def pin_lat(self, i: int) -> float:
+        return self.sections['pin_lats'][i]
+
+    def pin_lon(self, i: int) -> float:
+        return self.sections['pin_lons'][i]
+
+    def pin_entry(self, i: int) -> Dict:
+        return {
+            'pincode': self.sections['pin_codes'][i],
+            'latitude': self.sections['pin_lats'][i],
+            'longitude': self.sections['pin_lons'][i],
+            'town': self.sections['pin_towns'][i],
+            'state': self.sections['pin_states'][i],
+        }
+
+    def lookup_pincode(self, pincode: str) -> Optional[Dict]:
+        """PIN centroid straight from the mapped pages, without building an index"""
+        i = self.pin_index_of(pincode)
+        return self.pin_entry(i) if i >= 0 else None
+
+    def grid_cell_size(self) -> float:
+        return self.sections['grid_cell_size'][0]
+
+    def cell_members(self, ci: int, cj: int) -> List[int]:
+        """PIN rows in one grid cell, read from the mapped member array"""
+        keys = self.sections['grid_keys']
+        key = grid_key(ci, cj)
+        k = bisect.bisect_left(keys, key)
+        if k == len(keys) or keys[k] != key:
+            return ()
+        offsets = self.sections['grid_offsets']
+        return self.sections['grid_members'][offsets[k]:offsets[k + 1]].tolist()
+
+    def iter_pins(self):
+        codes, lats, lons = self.sections['pin_codes'], self.sections['pin_lats'], self.sections['pin_lons']
+        towns, states = self.sections['pin_towns'], self.sections['pin_states']
+        for i in range(len(codes)):
+            yield codes[i], lats[i], lons[i], towns[i], states[i]
+
+    def close(self):
+        for section in self.sections.values():
+            if isinstance(section, StringTable):
+                section.offsets.release()
+                section.blob.release()
+            else:
+                section.release()
+        self.sections = {}
+        self.view.release()
+        self.mmap.close()
+
+
+def load_reference_data(path: str = REFERENCE_FILE,
+                        source_fingerprint: Optional[bytes] = None) -> Optional[ReferenceData]:
+    """Open the artifact if present, logging and returning None if it is unusable.
+
+    With source_fingerprint, an artifact built from other code-defined tables
+    is also rejected, so callers fall back to the tables in code.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        reference = ReferenceData(path)
+    except ReferenceDataError as e:
+        logger.warning(str(e))
+        return None
+    if source_fingerprint is not None and reference.is_stale(source_fingerprint):
+        logger.warning(f"{path} is out of date; rebuild with 'python reference_data.py build'")
+        reference.close()
+        return None
+    return reference
+
+
+def build(output_file: str = REFERENCE_FILE, pin_file: Optional[str] = None) -> int:
+    """Compile the engine state mapping, parser city list and PIN centroids into one artifact"""
+    from engine import PIN_CENTROIDS_FILE
+    from parser import CITY_NAMES
+    from spatial_index import PinSpatialIndex
+
+    pin_file = pin_file or PIN_CENTROIDS_FILE
+    pins = []
+    if os.path.exists(pin_file):
+        pins = list(PinSpatialIndex.from_csv(pin_file).iter_pins())
+
+    fingerprint = fingerprint_sources(STATE_MAPPING, CITY_NAMES)
+    return build_artifact(output_file, STATE_MAPPING, CITY_NAMES, pins, fingerprint,
+                          pin_source=os.path.abspath(pin_file))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Build or inspect the reference-data artifact")
+    subcommands = arg_parser.add_subparsers(dest='command', required=True)
+    build_cmd = subcommands.add_parser('build', help="compile reference data into one binary file")
+    build_cmd.add_argument('--output', default=REFERENCE_FILE)
+    build_cmd.add_argument('--pin-file', default=None, help="PIN centroid CSV (default: engine.PIN_CENTROIDS_FILE)")
+    info_cmd = subcommands.add_parser('info', help="verify an artifact and print its contents")
+    info_cmd.add_argument('--path', default=REFERENCE_FILE)
+    args = arg_parser.parse_args()
+
+    if args.command == 'build':
+        start = time.time()
+        size = build(args.output, args.pin_file)
+        print(f"Wrote {args.output} ({size} bytes) in {time.time() - start:.2f}s")
+    else:
+        start = time.perf_counter()
+        data = ReferenceData(args.path)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Opened {args.path} in {elapsed:.2f} ms")
+        print(f"States: {len(data.sections['state_names'])}, state codes: {len(data.sections['state_codes'])}, "
+              f"cities: {len(data.sections['cities'])}, PINs: {data.pin_count()}")
+        print(f"Source fingerprint: {data.source_fingerprint.hex()}")
+        print(f"PIN digest: {data.pin_digest.hex()} from {data.pin_source() or '(none)'}")
+        if data.pin_source() and os.path.exists(data.pin_source()):
+            from spatial_index import PinSpatialIndex
+            current = digest_pins(PinSpatialIndex.from_csv(data.pin_source()).iter_pins())
+            print("PIN source unchanged" if current == data.pin_digest
+                  else "PIN source has changed since the build; rebuild to pick it up")
+        data.close()
+
+
+if __name__ == "__main__":
+    main()
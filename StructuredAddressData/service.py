@@ -0,0 +1,253 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+from pipeline import AddressPipeline, Record, to_legal_address
+
+logger = logging.getLogger(__name__)
+
+# Throughput in /stats covers requests completed in this many seconds, first to last, so idle time is left out
+THROUGHPUT_WINDOW = 60.0
+
+
+class MicroBatcher:
+    """Coalesce concurrent single requests into batches.
+
+    The first request opens a batch; the batch is flushed when it reaches
+    max_batch items or max_wait seconds have passed, whichever comes first.
+    Up to workers batches run at once, and a new batch is only opened when
+    a worker is free, so requests keep coalescing while all workers are busy.
+    """
+
+    def __init__(self, process_batch: Callable[[List], List], max_batch: int = 64, max_wait: float = 0.005,
+                 workers: int = 1):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: queue.Queue = queue.Queue()
+        self.batch_sizes: deque = deque(maxlen=10000)
+        self.slots = threading.Semaphore(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch')
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, item) -> Future:
+        future: Future = Future()
+        self.queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            self.slots.acquire()
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.batch_sizes.append(len(batch))
+            self.executor.submit(self._process, batch)
+
+    def _process(self, batch: List):
+        try:
+            try:
+                results = self.process_batch([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception:
+                if len(batch) == 1:
+                    raise
+                # Retry item by item so one bad record only fails its own request
+                for item, future in batch:
+                    try:
+                        future.set_result(self.process_batch([item])[0])
+                    except Exception as e:
+                        future.set_exception(e)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+
+class AddressService:
+    """Single and bulk parsing over a pool of warm pipelines, with latency tracking"""
+
+    def __init__(self, instances: int = 2, max_batch: int = 64, max_wait: float = 0.005,
+                 use_geocoder: bool = False):
+        logging.basicConfig(level=logging.INFO)
+        self.pipelines: queue.Queue = queue.Queue()
+        for _ in range(instances):
+            self.pipelines.put(AddressPipeline(use_geocoder=use_geocoder))
+        self.batcher = MicroBatcher(self._run_batch, max_batch=max_batch, max_wait=max_wait, workers=instances)
+
+        self.lock = threading.Lock()
+        self.latencies: deque = deque(maxlen=10000)
+        self.requests = 0
+        self.rows = 0
+        # (completion time, rows) of recent requests, for throughput
+        self.completions: deque = deque(maxlen=100000)
+
+    def _run_batch(self, records: List[Record]) -> List[Dict[str, str]]:
+        pipeline = self.pipelines.get()
+        try:
+            return pipeline.parse_records(records)
+        finally:
+            self.pipelines.put(pipeline)
+
+    def _record(self, started: float, rows: int):
+        with self.lock:
+            self.latencies.append(time.perf_counter() - started)
+            self.completions.append((time.monotonic(), rows))
+            self.requests += 1
+            self.rows += rows
+
+    def normalize(self, records: List[Record]) -> List[Dict[str, str]]:
+        """Flat Entity.LegalAddress.* records; ValueError names the first malformed one"""
+        normalized = []
+        for i, record in enumerate(records):
+            try:
+                normalized.append(to_legal_address(record))
+            except ValueError as e:
+                raise ValueError(f"records[{i}]: {str(e)}")
+        return normalized
+
+    def parse_one(self, record: Dict[str, str]) -> Dict[str, str]:
+        """Parse one normalized record through the micro-batcher"""
+        started = time.perf_counter()
+        result = self.batcher.submit(record).result()
+        self._record(started, 1)
+        return result
+
+    def parse_bulk(self, records: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Parse normalized records as one batch"""
+        started = time.perf_counter()
+        results = self._run_batch(records) if records else []
+        self._record(started, len(records))
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            requests, rows = self.requests, self.rows
+            horizon = time.monotonic() - THROUGHPUT_WINDOW
+            recent = [(finished, count) for finished, count in self.completions if finished >= horizon]
+        batch_sizes = list(self.batcher.batch_sizes)
+        # Rate between the first and last completion in the window; the first only marks the start
+        span = recent[-1][0] - recent[0][0] if len(recent) > 1 else 0.0
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            'requests': requests,
+            'rows': rows,
+            'p50_ms': percentile(0.50),
+            'p99_ms': percentile(0.99),
+            'requests_per_sec': (len(recent) - 1) / span if span else 0.0,
+            'rows_per_sec': sum(count for _, count in recent[1:]) / span if span else 0.0,
+            'mean_batch_size': sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+        }
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections under concurrent load
+    request_queue_size = 256
+
+
+def make_handler(service: AddressService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            elif self.path == '/stats':
+                self._send_json(200, service.stats())
+            else:
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path not in ('/parse', '/parse/bulk'):
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+                return
+            # Only request validation maps to 400; anything raised while parsing is a server error
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'null')
+                if self.path == '/parse':
+                    # to_legal_address handles {"address": ...} bodies as well as bare strings
+                    records = [to_legal_address(payload)]
+                else:
+                    records = payload.get('records', []) if isinstance(payload, dict) else payload
+                    if not isinstance(records, list):
+                        raise ValueError("'records' must be a list")
+                    records = service.normalize(records)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            try:
+                if self.path == '/parse':
+                    self._send_json(200, service.parse_one(records[0]))
+                else:
+                    self._send_json(200, {'results': service.parse_bulk(records)})
+            except Exception as e:
+                logger.error(f"Error handling {self.path}: {str(e)}", exc_info=True)
+                self._send_json(500, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Local HTTP/JSON address parsing service")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--instances', type=int, default=2, help="number of warm parser instances")
+    arg_parser.add_argument('--max-batch', type=int, default=64)
+    arg_parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    arg_parser.add_argument('--geocode', action='store_true',
+                            help="look up PINs missing from the local index online (rate-limited to 1/s)")
+    args = arg_parser.parse_args()
+
+    service = AddressService(instances=args.instances, max_batch=args.max_batch,
+                             max_wait=args.max_wait_ms / 1000, use_geocoder=args.geocode)
+    server = ServiceHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving on http://{args.host}:{args.port} (POST /parse, POST /parse/bulk, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(service.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import csv
+import logging
+import math
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Accepted header spellings, including the India Post pincode directory layout
+COLUMN_ALIASES = {
+    'pincode': ['pincode', 'pin', 'postcode', 'postal_code'],
+    'latitude': ['latitude', 'lat'],
+    'longitude': ['longitude', 'lon', 'lng'],
+    'town': ['town', 'city', 'districtname', 'district'],
+    'state': ['state', 'statename'],
+}
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class PinSpatialIndex:
+    """Uniform lat/lon grid over PIN code centroids.
+
+    Each PIN is stored once at the mean of its source points. Nearest and
+    radius queries only visit grid cells that can contain an answer, so a
+    lookup touches a handful of points instead of the whole table.
+
+    With a base (a reference_data.ReferenceData), its mapped PIN and grid
+    sections are queried in place and only PINs added later, such as
+    geocoder results, are held in Python lists. Points are addressed by
+    key: i >= 0 for added PINs, -(row + 1) for base rows.
+    """
+
+    def __init__(self, cell_size: float = 0.1, base=None):
+        self.cell_size = cell_size
+        self.base = base
+        # Base rows replaced by an added PIN of the same code
+        self.shadowed = set()
+        self.pincodes: List[str] = []
+        self.lats: List[float] = []
+        self.lons: List[float] = []
+        self.towns: List[str] = []
+        self.states: List[str] = []
+        self.by_pincode: Dict[str, int] = {}
+        self.grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        base_count = self.base.pin_count() - len(self.shadowed) if self.base is not None else 0
+        return len(self.pincodes) + base_count
+
+    @classmethod
+    def from_csv(cls, path: str, cell_size: float = 0.1) -> 'PinSpatialIndex':
+        """Build an index from a CSV of pincode, latitude, longitude[, town, state] rows"""
+        index = cls(cell_size=cell_size)
+        sums: Dict[str, List] = {}
+
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            header = {name.strip().lower(): name for name in reader.fieldnames or []}
+            columns = {}
+            for key, aliases in COLUMN_ALIASES.items():
+                columns[key] = next((header[a] for a in aliases if a in header), None)
+            if not (columns['pincode'] and columns['latitude'] and columns['longitude']):
+                raise ValueError(f"{path} needs pincode, latitude and longitude columns")
+
+            for row in reader:
+                try:
+                    pincode = row[columns['pincode']].strip()
+                    lat = float(row[columns['latitude']])
+                    lon = float(row[columns['longitude']])
+                except (TypeError, ValueError):
+                    continue
+                if not pincode or math.isnan(lat) or math.isnan(lon):
+                    continue
+                entry = sums.setdefault(pincode, [0.0, 0.0, 0, '', ''])
+                entry[0] += lat
+                entry[1] += lon
+                entry[2] += 1
+                if not entry[3] and columns['town']:
+                    entry[3] = (row[columns['town']] or '').strip().upper()
+                if not entry[4] and columns['state']:
+                    entry[4] = (row[columns['state']] or '').strip().upper()
+
+        for pincode, (lat_sum, lon_sum, count, town, state) in sums.items():
+            index.add(pincode, lat_sum / count, lon_sum / count, town, state)
+        logger.info(f"Loaded {len(index)} PIN centroids from {path}")
+        return index
+
+    @classmethod
+    def from_pins(cls, pins: Iterable[Tuple[str, float, float, str, str]], cell_size: float = 0.1) -> 'PinSpatialIndex':
+        """Build an index from (pincode, latitude, longitude, town, state) tuples"""
+        index = cls(cell_size=cell_size)
+        for pincode, lat, lon, town, state in pins:
+            index.add(pincode, lat, lon, town, state)
+        return index
+
+    @classmethod
+    def from_reference(cls, reference) -> 'PinSpatialIndex':
+        """Index over a reference artifact's mapped PIN tables, using its grid"""
+        return cls(cell_size=reference.grid_cell_size(), base=reference)
+
+    @classmethod
+    def load(cls, path: Optional[str], cell_size: float = 0.1) -> 'PinSpatialIndex':
+        """Load from path if it exists, otherwise return an empty index"""
+        if path and os.path.exists(path):
+            return cls.from_csv(path, cell_size=cell_size)
+        if path:
+            logger.warning(f"PIN centroid file {path} not found; spatial fill disabled until populated")
+        return cls(cell_size=cell_size)
+
+    def iter_pins(self) -> Iterable[Tuple[str, float, float, str, str]]:
+        """(pincode, latitude, longitude, town, state) for every indexed PIN"""
+        if self.base is not None:
+            for row, pin in enumerate(self.base.iter_pins()):
+                if row not in self.shadowed:
+                    yield pin
+        yield from zip(self.pincodes, self.lats, self.lons, self.towns, self.states)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size))
+
+    def add(self, pincode: str, lat: float, lon: float, town: str = '', state: str = ''):
+        """Insert a PIN centroid, replacing any existing entry for the same PIN"""
+        if pincode in self.by_pincode:
+            i = self.by_pincode[pincode]
+            self.grid[self._cell(self.lats[i], self.lons[i])].remove(i)
+            self.lats[i], self.lons[i] = lat, lon
+            self.towns[i] = town or self.towns[i]
+            self.states[i] = state or self.states[i]
+        else:
+            row = self.base.pin_index_of(pincode) if self.base is not None else -1
+            if row >= 0:
+                base_entry = self.base.pin_entry(row)
+                town = town or base_entry['town']
+                state = state or base_entry['state']
+                self.shadowed.add(row)
+            i = len(self.pincodes)
+            self.pincodes.append(pincode)
+            self.lats.append(lat)
+            self.lons.append(lon)
+            self.towns.append(town)
+            self.states.append(state)
+            self.by_pincode[pincode] = i
+        self.grid[self._cell(lat, lon)].append(i)
+
+    def _point(self, key: int) -> Tuple[float, float]:
+        if key >= 0:
+            return self.lats[key], self.lons[key]
+        return self.base.pin_lat(-key - 1), self.base.pin_lon(-key - 1)
+
+    def _cell_keys(self, cell: Tuple[int, int]) -> List[int]:
+        keys = list(self.grid.get(cell, ()))
+        if self.base is not None:
+            keys.extend(-row - 1 for row in self.base.cell_members(*cell) if row not in self.shadowed)
+        return keys
+
+    def _entry(self, key: int, distance: Optional[float] = None) -> Dict:
+        if key >= 0:
+            entry = {
+                'pincode': self.pincodes[key],
+                'latitude': self.lats[key],
+                'longitude': self.lons[key],
+                'town': self.towns[key],
+                'state': self.states[key],
+            }
+        else:
+            entry = self.base.pin_entry(-key - 1)
+        if distance is not None:
+            entry['distance_km'] = distance
+        return entry
+
+    def lookup(self, pincode: str) -> Optional[Dict]:
+        """Centroid and names for a PIN, or None"""
+        i = self.by_pincode.get(pincode)
+        if i is not None:
+            return self._entry(i)
+        if self.base is not None:
+            return self.base.lookup_pincode(pincode)
+        return None
+
+    def _ring(self, center: Tuple[int, int], r: int) -> Iterable[Tuple[int, int]]:
+        ci, cj = center
+        if r == 0:
+            yield center
+            return
+        for dj in range(-r, r + 1):
+            yield ci - r, cj + dj
+            yield ci + r, cj + dj
+        for di in range(-r + 1, r):
+            yield ci + di, cj - r
+            yield ci + di, cj + r
+
+    def _min_ring_km(self, lat: float, r: int) -> float:
+        """Lower bound on the distance from a point to any cell in ring r around it"""
+        worst_lat = min(89.9, abs(lat) + r * self.cell_size)
+        return max(0, r - 1) * self.cell_size * KM_PER_DEGREE * math.cos(math.radians(worst_lat))
+
+    def nearest(self, lat: float, lon: float, max_km: Optional[float] = None) -> Optional[Dict]:
+        """Nearest PIN centroid to a point, optionally limited to max_km"""
+        if not len(self):
+            return None
+        center = self._cell(lat, lon)
+        max_ring = int(180 / self.cell_size)
+        best_i, best_d = None, math.inf
+        for r in range(max_ring + 1):
+            lower_bound = self._min_ring_km(lat, r)
+            if lower_bound > best_d or (max_km is not None and lower_bound > max_km):
+                break
+            for cell in self._ring(center, r):
+                for key in self._cell_keys(cell):
+                    d = haversine_km(lat, lon, *self._point(key))
+                    if d < best_d:
+                        best_i, best_d = key, d
+        if best_i is None or (max_km is not None and best_d > max_km):
+            return None
+        return self._entry(best_i, best_d)
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Dict]:
+        """All PIN centroids within radius_km, nearest first"""
+        lat_cells = int(math.ceil(radius_km / (self.cell_size * KM_PER_DEGREE)))
+        cos_lat = max(math.cos(math.radians(min(89.9, abs(lat) + lat_cells * self.cell_size))), 1e-6)
+        lon_cells = int(math.ceil(radius_km / (self.cell_size * KM_PER_DEGREE * cos_lat)))
+        ci, cj = self._cell(lat, lon)
+
+        hits = []
+        for di in range(-lat_cells, lat_cells + 1):
+            for dj in range(-lon_cells, lon_cells + 1):
+                for key in self._cell_keys((ci + di, cj + dj)):
+                    d = haversine_km(lat, lon, *self._point(key))
+                    if d <= radius_km:
+                        hits.append((d, key))
+        hits.sort()
+        return [self._entry(key, d) for d, key in hits]
+
+    def nearest_bulk(self, points: Iterable[Tuple[float, float]], max_km: Optional[float] = None) -> List[Optional[Dict]]:
+        """nearest() for many points, reusing results for repeated coordinates"""
+        seen: Dict[Tuple[float, float], Optional[Dict]] = {}
+        results = []
+        for point in points:
+            if point not in seen:
+                seen[point] = self.nearest(point[0], point[1], max_km=max_km)
+            results.append(seen[point])
+        return results
+
+    def within_radius_bulk(self, points: Iterable[Tuple[float, float]], radius_km: float) -> List[List[Dict]]:
+        """within_radius() for many points"""
+        return [self.within_radius(lat, lon, radius_km) for lat, lon in points]
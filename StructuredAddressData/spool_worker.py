@@ -0,0 +1,321 @@
+import argparse
+import logging
+import os
+import shutil
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from parser import INPUT_EXTENSIONS, AddressParser, parse_file
+
+logger = logging.getLogger(__name__)
+
+# One warm parser per worker process
+_worker_parser: Optional[AddressParser] = None
+
+
+def _get_worker_parser() -> AddressParser:
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = AddressParser()
+        # Per-record INFO logging dominates runtime on large files
+        _worker_parser.logger.setLevel(logging.WARNING)
+    return _worker_parser
+
+
+def output_name(input_name: str) -> str:
+    """structured_addresses_1.csv for 1.csv; other extensions are kept so 1.json does not overwrite it"""
+    stem, ext = os.path.splitext(input_name)
+    if ext.lower() != '.csv':
+        stem = f"{stem}_{ext[1:].lower()}"
+    return f"structured_addresses_{stem}.csv"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def process_claimed_file(claimed_path: str, output_dir: str, chunksize: int) -> int:
+    """Parse one claimed file and atomically publish its output. Returns rows written."""
+    name = output_name(os.path.basename(claimed_path))
+    output_file = os.path.join(output_dir, name)
+    tmp_file = os.path.join(output_dir, f".{name}.tmp")
+    try:
+        rows = parse_file(_get_worker_parser(), claimed_path, tmp_file, chunksize=chunksize)
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return rows
+
+
+class SpoolWorker:
+    """Drain an input spool directory with a bounded pool of parser processes.
+
+    Files are claimed by renaming them into a per-worker directory under
+    work_dir named <host>-<pid>, so several workers can share one spool and
+    each knows which claims are its own. At most max_queue files are in
+    flight; the rest stay in the spool until a slot frees up.
+
+    Every claim is counted in work_dir/.attempts, which survives requeues
+    and restarts. A file that keeps killing its worker process (or this
+    daemon) is moved to failed_dir after max_attempts claims instead of
+    being retried forever.
+    """
+
+    def __init__(self, spool_dir: str = "data/input", work_dir: str = "data/processing",
+                 output_dir: str = "data/output", failed_dir: str = "data/failed",
+                 archive_dir: str = "data/archive", workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, chunksize: int = 10000,
+                 min_age: float = 1.0, max_attempts: int = 3):
+        logging.basicConfig(level=logging.INFO)
+        self.spool_dir = spool_dir
+        self.work_dir = work_dir
+        self.output_dir = output_dir
+        self.failed_dir = failed_dir
+        self.archive_dir = archive_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue or self.workers * 2
+        self.chunksize = chunksize
+        self.min_age = min_age
+        self.max_attempts = max_attempts
+        self.hostname = socket.gethostname()
+        self.claim_dir = os.path.join(work_dir, f"{self.hostname}-{os.getpid()}")
+        self.attempts_dir = os.path.join(work_dir, '.attempts')
+
+        self.files_done = 0
+        self.files_failed = 0
+        self.rows_done = 0
+        self.start_time = None
+
+        for directory in (spool_dir, work_dir, output_dir, failed_dir, archive_dir, self.attempts_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def is_stale_claim(self, claim_dir_name: str) -> bool:
+        """A claim directory is stale when its owner was a process on this host that has exited"""
+        host, _, pid = claim_dir_name.rpartition('-')
+        if host != self.hostname or not pid.isdigit():
+            return False  # owned by another host; only that host can tell whether it is alive
+        return int(pid) != os.getpid() and not _pid_alive(int(pid))
+
+    def _attempts_file(self, name: str) -> str:
+        return os.path.join(self.attempts_dir, name)
+
+    def attempts(self, name: str) -> int:
+        try:
+            with open(self._attempts_file(name), encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def set_attempts(self, name: str, count: int):
+        if count <= 0:
+            if os.path.exists(self._attempts_file(name)):
+                os.remove(self._attempts_file(name))
+            return
+        tmp_file = self._attempts_file(f".{name}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(str(count))
+        os.replace(tmp_file, self._attempts_file(name))
+
+    def dead_letter(self, claimed_path: str, reason: str):
+        name = os.path.basename(claimed_path)
+        shutil.move(claimed_path, os.path.join(self.failed_dir, name))
+        with open(os.path.join(self.failed_dir, f"{name}.error"), 'w', encoding='utf-8') as f:
+            f.write(reason + '\n')
+        self.set_attempts(name, 0)
+        self.files_failed += 1
+        logger.error(f"Failed {name}: {reason}")
+
+    def requeue(self, claimed_path: str):
+        os.replace(claimed_path, os.path.join(self.spool_dir, os.path.basename(claimed_path)))
+
+    def recover(self):
+        """Return files claimed by workers on this host that have since died to the spool"""
+        for entry in os.scandir(self.work_dir):
+            if entry.path == self.attempts_dir:
+                continue
+            if entry.is_file():
+                # Flat layout from before per-worker claim directories
+                self.requeue(entry.path)
+                logger.info(f"Recovered {entry.name} from interrupted run")
+            elif entry.is_dir() and self.is_stale_claim(entry.name):
+                for name in os.listdir(entry.path):
+                    self.requeue(os.path.join(entry.path, name))
+                    logger.info(f"Recovered {name} from exited worker {entry.name}")
+                os.rmdir(entry.path)
+
+    def claim(self, limit: int) -> List[str]:
+        """Atomically move up to limit settled input files into this worker's claim directory"""
+        claimed = []
+        now = time.time()
+        for entry in sorted(os.scandir(self.spool_dir), key=lambda e: e.name):
+            if len(claimed) >= limit:
+                break
+            if not entry.is_file() or not entry.name.lower().endswith(INPUT_EXTENSIONS):
+                continue
+            try:
+                # Skip files that may still be being written
+                if now - entry.stat().st_mtime < self.min_age:
+                    continue
+                target = os.path.join(self.claim_dir, entry.name)
+                os.rename(entry.path, target)
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            attempt = self.attempts(entry.name) + 1
+            if attempt > self.max_attempts:
+                self.dead_letter(target, f"Gave up after {self.max_attempts} attempts; "
+                                         f"each ended with the worker process dying or the run being killed")
+                continue
+            self.set_attempts(entry.name, attempt)
+            claimed.append(target)
+        return claimed
+
+    def _finish(self, claimed_path: str, error: Optional[BaseException], rows: int):
+        name = os.path.basename(claimed_path)
+        if isinstance(error, (KeyboardInterrupt, CancelledError)):
+            # Interrupted rather than failed: the file goes back for the next run, and the claim does not count
+            self.set_attempts(name, self.attempts(name) - 1)
+            self.requeue(claimed_path)
+            logger.info(f"Returned {name} to the spool")
+        elif isinstance(error, BrokenProcessPool):
+            # A worker process died, possibly because of this file; the claim counts towards max_attempts
+            self.requeue(claimed_path)
+            logger.warning(f"Worker process died with {name} in flight "
+                           f"(attempt {self.attempts(name)} of {self.max_attempts}); returned it to the spool")
+        elif error is None:
+            self.set_attempts(name, 0)
+            shutil.move(claimed_path, os.path.join(self.archive_dir, name))
+            self.files_done += 1
+            self.rows_done += rows
+            logger.info(f"Processed {name}: {rows} rows")
+        else:
+            self.set_attempts(name, 0)
+            shutil.move(claimed_path, os.path.join(self.failed_dir, name))
+            with open(os.path.join(self.failed_dir, f"{name}.error"), 'w', encoding='utf-8') as f:
+                f.write(''.join(traceback.format_exception(type(error), error, error.__traceback__)))
+            self.files_failed += 1
+            logger.error(f"Failed {name}: {error}")
+
+    def _collect(self, future, path: str) -> Optional[BaseException]:
+        try:
+            error = future.exception()
+        except CancelledError as e:
+            error = e
+        self._finish(path, error, 0 if error else future.result())
+        return error
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _replace_broken_pool(self, pool: ProcessPoolExecutor, pending: Dict) -> ProcessPoolExecutor:
+        """Settle every file of a broken pool and start a fresh one"""
+        for future in list(pending):
+            # Futures of a broken pool all complete with BrokenProcessPool
+            wait([future])
+            self._collect(future, pending.pop(future))
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Restarted the worker pool after a worker process died")
+        return self._new_pool()
+
+    def stats(self) -> Dict[str, float]:
+        elapsed = max(time.time() - self.start_time, 1e-9) if self.start_time else 0.0
+        return {
+            'files': self.files_done,
+            'failed': self.files_failed,
+            'rows': self.rows_done,
+            'elapsed': elapsed,
+            'files_per_sec': self.files_done / elapsed if elapsed else 0.0,
+            'rows_per_sec': self.rows_done / elapsed if elapsed else 0.0,
+        }
+
+    def display_stats(self):
+        stats = self.stats()
+        print(f"{stats['files']} files ({stats['failed']} failed), {stats['rows']} rows "
+              f"in {stats['elapsed']:.1f}s: {stats['files_per_sec']:.2f} files/s, "
+              f"{stats['rows_per_sec']:.1f} rows/s")
+
+    def run(self, once: bool = False, poll_interval: float = 2.0, report_interval: float = 30.0):
+        """Process the spool until empty (once=True) or forever"""
+        self.recover()
+        os.makedirs(self.claim_dir, exist_ok=True)
+        self.start_time = time.time()
+        last_report = self.start_time
+        pending: Dict = {}
+
+        pool = self._new_pool()
+        try:
+            while True:
+                for path in self.claim(self.max_queue - len(pending)):
+                    try:
+                        future = pool.submit(process_claimed_file, path, self.output_dir, self.chunksize)
+                    except BrokenProcessPool as e:
+                        self._finish(path, e, 0)
+                        pool = self._replace_broken_pool(pool, pending)
+                        break
+                    pending[future] = path
+
+                if not pending:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    broken |= isinstance(self._collect(future, pending.pop(future)), BrokenProcessPool)
+                if broken:
+                    pool = self._replace_broken_pool(pool, pending)
+
+                if time.time() - last_report >= report_interval:
+                    self.display_stats()
+                    last_report = time.time()
+        except KeyboardInterrupt:
+            print("Interrupted; waiting for in-flight files...")
+            for future in pending:
+                future.cancel()
+            for future, path in pending.items():
+                self._collect(future, path)
+        finally:
+            pool.shutdown(wait=True)
+
+        try:
+            os.rmdir(self.claim_dir)
+        except OSError:
+            logger.warning(f"{self.claim_dir} is not empty; its files are recovered on the next start")
+        self.display_stats()
+        return self.stats()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Process address files from a spool directory")
+    arg_parser.add_argument('--spool-dir', default='data/input')
+    arg_parser.add_argument('--output-dir', default='data/output')
+    arg_parser.add_argument('--workers', type=int, default=None)
+    arg_parser.add_argument('--max-queue', type=int, default=None,
+                            help="maximum number of files in flight (default: 2 x workers)")
+    arg_parser.add_argument('--chunksize', type=int, default=10000)
+    arg_parser.add_argument('--once', action='store_true', help="exit once the spool is empty")
+    arg_parser.add_argument('--poll-interval', type=float, default=2.0)
+    arg_parser.add_argument('--max-attempts', type=int, default=3,
+                            help="claims of one file before it is moved to the failed directory")
+    args = arg_parser.parse_args()
+
+    worker = SpoolWorker(spool_dir=args.spool_dir, output_dir=args.output_dir,
+                         workers=args.workers, max_queue=args.max_queue,
+                         chunksize=args.chunksize, max_attempts=args.max_attempts)
+    worker.run(once=args.once, poll_interval=args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()